@@ -1,10 +1,23 @@
+import asyncio
+import json
 import logging
 import os
+import re
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
+import aiohttp
 from dotenv import load_dotenv
 
+try:
+    # Optional C parser for ISO8601 timestamps (much faster than fromisoformat)
+    import ciso8601
+except ImportError:  # pragma: no cover - optional dependency
+    ciso8601 = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,44 +30,58 @@ logger = logging.getLogger(__name__)
 # Safe environment parsing helpers
 # ============================================================================
 def _safe_int_env(name: str, default: int) -> int:
-    """Safely parse integer environment variable with fallback."""
-    val = os.environ.get(name)
-    if val is None or val == "":
+    """
+    Parse an integer environment variable; unset or empty uses the default.
+    A malformed value fails startup instead of silently using the default.
+    """
+    val = _ENV.get(name)
+    if not val:
         return default
     try:
         return int(val)
     except ValueError:
-        logger.warning(f"Invalid integer for {name}: {val!r}; using default {default}")
-        return default
+        logger.error(f"Invalid integer for {name}: {val!r}")
+        raise RuntimeError(f"{name} must be an integer, got {val!r}") from None
 
 
 def _safe_float_env(name: str, default: float) -> float:
-    """Safely parse float environment variable with fallback."""
-    val = os.environ.get(name)
-    if val is None or val == "":
+    """
+    Parse a float environment variable; unset or empty uses the default.
+    A malformed value fails startup instead of silently using the default.
+    """
+    val = _ENV.get(name)
+    if not val:
         return default
     try:
         return float(val)
     except ValueError:
-        logger.warning(f"Invalid float for {name}: {val!r}; using default {default}")
-        return default
+        logger.error(f"Invalid float for {name}: {val!r}")
+        raise RuntimeError(f"{name} must be a number, got {val!r}") from None
 
 
 # ============================================================================
 # Timezone-aware datetime helpers
 # ============================================================================
+@lru_cache(maxsize=4096)
 def _parse_iso_to_utc(value: str) -> datetime:
     """
     Parse ISO8601 string to timezone-aware UTC datetime.
     If the string has no tzinfo, we assume it was stored as UTC.
+    Results are cached: the same join/end timestamps are parsed repeatedly
+    across reminders, validation and leave handling.
     """
-    dt = datetime.fromisoformat(value)
+    if ciso8601 is not None:
+        dt = ciso8601.parse_datetime(value)
+    else:
+        dt = datetime.fromisoformat(value)
     if dt.tzinfo is None:
         # Assume naive timestamps were stored as UTC
         dt = dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 from telegram import (
+    Bot,
     Update,
+    User,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     KeyboardButton,
@@ -62,7 +89,10 @@ from telegram import (
     ReplyKeyboardRemove,
     WebAppInfo,
 )
+from telegram.constants import ParseMode
 from telegram.ext import (
+    AIORateLimiter,
+    Application,
     ApplicationBuilder,
     CallbackQueryHandler,
     ChatMemberHandler,
@@ -76,30 +106,54 @@ from storage import (
     get_pending_verification,
     set_pending_verification,
     clear_pending_verification,
-    append_trial_log,
+    bulk_append_trial_log,
     has_used_trial,
     mark_trial_used,
+    finalize_trial,
     get_used_trial_info,
     get_active_trial,
     set_active_trial,
     clear_active_trial,
     get_all_active_trials,
-    get_invite_info,
+    get_all_active_trials_typed,
+    get_phone_stage_user_ids,
+    get_user_state,
     set_invite_info,
     get_valid_invite_link,
     track_start_click,
+    flush_pending_writes,
+    USED_TRIALS_FILE,
+    ACTIVE_TRIALS_FILE,
 )
 
 
 # Load .env file (if present) into environment variables
 load_dotenv()
+# Snapshot the environment once; all config below is read from this dict
+_ENV: Dict[str, str] = dict(os.environ)
 
-BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
+BOT_TOKEN = _ENV.get("BOT_TOKEN", "")
 TRIAL_CHANNEL_ID = _safe_int_env("TRIAL_CHANNEL_ID", 0)
-BASE_URL = os.environ.get("BASE_URL", "http://127.0.0.1:5000")
-BLOCKED_PHONE_COUNTRY_CODE = os.environ.get("BLOCKED_PHONE_COUNTRY_CODE", "+91")
+BASE_URL = _ENV.get("BASE_URL", "http://127.0.0.1:5000")
+# Comma-separated list of blocked phone prefixes, e.g. "+91,+92"
+BLOCKED_PHONE_COUNTRY_CODE = _ENV.get("BLOCKED_PHONE_COUNTRY_CODE", "+91")
+_BLOCKED_PHONE_CODES: tuple[str, ...] = tuple(
+    c.strip() for c in BLOCKED_PHONE_COUNTRY_CODE.split(",") if c.strip()
+)
 TIMEZONE_OFFSET_HOURS = _safe_float_env("TIMEZONE_OFFSET_HOURS", 0.0)
-API_SECRET = os.environ.get("API_SECRET", "")  # Optional: for web app API authentication
+_TZ_OFFSET_SEC = int(TIMEZONE_OFFSET_HOURS * 3600)
+API_SECRET = _ENV.get("API_SECRET", "")  # Optional: for web app API authentication
+# Use header-only authentication (more secure than URL query string)
+_API_HEADERS = {"X-API-Secret": API_SECRET} if API_SECRET else {}
+
+# Derived from BASE_URL once; Telegram Web Apps require HTTPS, so use a regular URL button otherwise
+_BASE_URL_CLEAN = BASE_URL.rstrip('/')
+_TRIAL_URL_TMPL = _BASE_URL_CLEAN + "/trial?tg_id={}"
+_VERIFY_API_URL_TMPL = _BASE_URL_CLEAN + "/api/get-verification?tg_id={}"
+_USE_WEBAPP = BASE_URL.startswith("https://")
+
+# Text that looks like a typed phone number (7+ digits/spaces/+-() in a row)
+_PHONE_LIKE_RE = re.compile(r'[\d+\-()\s]{7,}')
 
 # Validate required environment variables for production deployment
 if not BOT_TOKEN:
@@ -118,9 +172,19 @@ if TRIAL_CHANNEL_ID == 0:
 # Set these to small values (e.g., 5 minutes = 0.083 hours) for testing
 TRIAL_HOURS_3_DAY = _safe_float_env("TRIAL_HOURS_3_DAY", 72.0)
 TRIAL_HOURS_5_DAY = _safe_float_env("TRIAL_HOURS_5_DAY", 120.0)
+# Integer-hour keys for trial-type lookups (avoids float equality on env values)
+_TRIAL_HOURS_3_DAY_I = int(round(TRIAL_HOURS_3_DAY))
+_TRIAL_HOURS_5_DAY_I = int(round(TRIAL_HOURS_5_DAY))
 TAMPERING_TOLERANCE_SECONDS = 3600  # 1 hour tolerance for trial data validation
 TRIAL_COOLDOWN_DAYS = 30  # Days before user can request another trial
 INVITE_LINK_EXPIRY_HOURS = 5  # Hours before invite link expires
+_CLEANUP_CONCURRENCY = 16  # Max expired trials processed in parallel by periodic cleanup
+# Web app API calls: fail fast on an unreachable host, cap the whole request at 5s
+_WEB_API_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_connect=1.0, sock_read=4.0)
+# The per-user trial_end jobs do the real work; the full scan is only a safety net
+CLEANUP_INTERVAL_HOURS = _safe_float_env("CLEANUP_INTERVAL_HOURS", 6.0)
+_INVITE_EXPIRY_DELTA = timedelta(hours=INVITE_LINK_EXPIRY_HOURS)
+_INVITE_EXPIRY_SECS = INVITE_LINK_EXPIRY_HOURS * 3600
 
 # Reminder timing (in MINUTES for easier testing - set to 3, 5, 7 for quick tests)
 # For production: 1440 (24h), 2880 (48h), 4320 (72h), 5760 (96h), 7200 (120h)
@@ -132,10 +196,220 @@ REMINDER_4_MINUTES = _safe_float_env("REMINDER_4_MINUTES", 5760.0)  # 96 hours (
 TRIAL_END_5DAY_MINUTES = _safe_float_env("TRIAL_END_5DAY_MINUTES", 7200.0)  # 120 hours default
 
 # Configurable support/giveaway links (fallback to defaults if not set)
-GIVEAWAY_CHANNEL_URL = os.environ.get("GIVEAWAY_CHANNEL_URL", "https://t.me/Freya_Trades")
-SUPPORT_CONTACT = os.environ.get("SUPPORT_CONTACT", "@cogitosk")
-FEEDBACK_FORM_URL = os.environ.get("FEEDBACK_FORM_URL", "https://forms.gle/K7ubyn2tvzuYeHXn9")
-SUPPORT_FORM_URL = os.environ.get("SUPPORT_FORM_URL", "https://forms.gle/CJbNczZ6BcKjk6Bz9")
+GIVEAWAY_CHANNEL_URL = _ENV.get("GIVEAWAY_CHANNEL_URL", "https://t.me/Freya_Trades")
+SUPPORT_CONTACT = _ENV.get("SUPPORT_CONTACT", "@cogitosk")
+FEEDBACK_FORM_URL = _ENV.get("FEEDBACK_FORM_URL", "https://forms.gle/K7ubyn2tvzuYeHXn9")
+SUPPORT_FORM_URL = _ENV.get("SUPPORT_FORM_URL", "https://forms.gle/CJbNczZ6BcKjk6Bz9")
+
+# User-facing messages built from the constants above (they never change after boot)
+_ALREADY_USED_MSG = (
+    "You have already used your free 3-day trial once.\n\n"
+    "🎁 For more chances, you can join our giveaway channel:\n"
+    f"{GIVEAWAY_CHANNEL_URL}\n\n"
+    f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
+)
+_REJECT_USED_TRIAL_MSG = (
+    "You have already used a trial. Please wait before requesting another.\n\n"
+    "🎁 For more chances, you can join our giveaway channel:\n"
+    f"{GIVEAWAY_CHANNEL_URL}\n\n"
+    f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
+)
+_TRIAL_FINISHED_MSG = (
+    "⛔ Your trial has finished. If you enjoyed the signals, you can upgrade "
+    "to a paid plan to continue."
+)
+_COOLDOWN_MSG = (
+    f"You recently used a trial. Please wait {TRIAL_COOLDOWN_DAYS} days before requesting another.\n\n"
+    "🎁 For more chances, you can join our giveaway channel:\n"
+    f"{GIVEAWAY_CHANNEL_URL}\n\n"
+    f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
+)
+
+_REMINDER_3DAY_1_TEXT = (
+    "Hey, it's Freya 💋\n\n"
+    "You've been inside my 3-Day Trial for about a day now – I hope you've already seen how I structure my trades and risk.\n\n"
+    "In this group you'll usually see:\n\n"
+    "• 🔔 2–6 signals per day\n"
+    "• 🎯 Clear entry, take-profit levels & stop-loss\n"
+    "• 📊 Screenshots + short explanation so you can learn, not just copy\n\n"
+    "If you missed anything, scroll up in the trial chat and check today's setups – everything is transparent, including wins and SL.\n\n"
+    f"If you have any questions, you can always DM me here: {SUPPORT_CONTACT}\n\n"
+    "Stay tuned, more setups are coming. 💸"
+)
+
+_REMINDER_3DAY_2_TEXT = (
+    "Day 2 check-in 🧡\n\n"
+    "You're almost two days into the trial now. You've probably noticed:\n\n"
+    "• How I wait for clean setups, not random entries\n"
+    "• How every trade comes with a fixed SL (no \"no-SL gambling\")\n"
+    "• How I manage multiple take-profits to lock in profit\n\n"
+    "If this style fits you and you want daily guidance, my members stay with me on a 30-Day Premium plan where they get:\n\n"
+    "• Full-access signals (all pairs / gold / indices I trade)\n"
+    "• Priority support in DM\n"
+    "• Occasional market breakdowns & extra tips\n\n"
+    "I'll send you a small reminder again when your trial is about to end, so you don't miss the chance to continue.\n\n"
+    "For now – just keep watching the signals and see if it matches your personality and schedule. ❤️\n\n"
+    f"If you already know you want to stay, message me 'PREMIUM' here: {SUPPORT_CONTACT}"
+)
+
+_REMINDER_5DAY_1_TEXT = (
+    "⏱ 1 day (24 hours) has passed, 4 days remaining in your 5-day trial.\n\n"
+    f"💬 Enjoying the signals? Upgrade anytime by contacting {SUPPORT_CONTACT}"
+)
+
+_REMINDER_5DAY_3_TEXT = (
+    "⏱ 3 days (72 hours) have passed, 2 days remaining in your 5-day trial.\n\n"
+    f"💬 Questions about upgrading? Contact {SUPPORT_CONTACT}"
+)
+
+_REMINDER_5DAY_4_TEXT = (
+    "⏱ 4 days (96 hours) have passed. Only the last 24 hours left in your trial!\n\n"
+    f"⚡ Don't miss out! Contact {SUPPORT_CONTACT} to upgrade and keep receiving signals."
+)
+
+_TRIAL_END_TEXT = (
+    "Your trial just ended 🕊\n\n"
+    "Thank you for testing Freya's Flirty Profits for 3 days.\n\n"
+    "If you liked the structure of the signals and want to keep going, here are your options:\n\n"
+    "✅ 30-Day Premium Membership\n"
+    "– Full access to all signals\n"
+    "– Same entries I personally take\n"
+    "– Ongoing DM support for questions\n\n"
+    f"Message me directly: {SUPPORT_CONTACT}\n\n"
+    "If you're not ready yet, no pressure – you can also stay connected through my public channel for updates and occasional previews:\n\n"
+    f"🌐 Public channel: {GIVEAWAY_CHANNEL_URL}\n\n"
+    "Trade safe, manage your risk, and remember: no one wins every trade – the edge comes from discipline. 💚"
+)
+
+# Leave message: only usage_info/total_days vary, the footer is fixed
+# Static links are baked in (braces escaped) so only the dynamic fields are filled per leave
+_LEAVE_MSG_TMPL = (
+    "👋 You have left the trial channel.\n"
+    "{usage_info}\n\n"
+    "Your free {total_days}-day trial has been marked as consumed.\n\n"
+    "We hope you enjoyed testing our signals! 🙌\n\n"
+) + (
+    f"📝 We'd love to hear your feedback:\n{FEEDBACK_FORM_URL}\n\n"
+    f"🎁 For more chances, join our giveaway: {GIVEAWAY_CHANNEL_URL}\n"
+    f"💬 Ready to upgrade? DM {SUPPORT_CONTACT}"
+).replace("{", "{{").replace("}", "}}")
+
+# Per-user status messages: only the numbers are filled in per call
+_ACTIVE_TRIAL_STATUS_TMPL = (
+    "✅ You are currently in your {total_days}-day free trial!\n\n"
+    "⏱ Time elapsed: {elapsed} hours\n"
+    "⏳ Time remaining: {remaining} hours\n\n"
+    "You will receive reminders as your trial approaches the end.\n\n"
+) + f"💬 Questions? DM {SUPPORT_CONTACT}".replace("{", "{{").replace("}", "}}")
+_ALREADY_IN_TRIAL_TMPL = (
+    "✅ You are already in your {total_days}-day free trial!\n\n"
+    "⏱ Time elapsed: {elapsed} hours\n"
+    "⏳ Time remaining: {remaining} hours\n\n"
+    "No need to verify again - you're already in the trial channel!"
+)
+_TRIAL_STARTED_TMPL = (
+    "✅ Your {trial_days}-day ({total_hours} hours) trial phase has started now!\n\n"
+    "You will receive reminders as your trial approaches the end."
+)
+
+# Static command replies (help/about/support never change; FAQ has a weekday and weekend variant)
+_HELP_TEXT = (
+    "🤖 *About This Bot*\n\n"
+    "This bot is used to manage users accessing premium content and services.\n\n"
+    "📋 *Available Commands:*\n"
+    "• /start - Start the bot and begin free trial\n"
+    "• /help - Help and commands list\n"
+    "• /faq - Frequently asked questions\n"
+    "• /about - About this bot\n"
+    "• /support - Contact support\n\n"
+    "🔐 *Verification Process:*\n\n"
+    "*Step 1: Initial Verification*\n"
+    "1. Click on /start command\n"
+    "2. A 'Get Free Trial' button will appear\n"
+    "3. Click on the button to open the verification page\n"
+    "4. Turn off VPN/Proxy before proceeding\n"
+    "5. IP test will happen automatically\n"
+    "6. Fill in your details:\n"
+    "   • Name (required)\n"
+    "   • Country (required)\n"
+    "   • Email (optional - you can delete later)\n"
+    "7. Close the Telegram mini-app\n\n"
+    "*Step 2: Phone Verification*\n"
+    "1. If Step 1 passed, click on 'Continue verification'\n"
+    "2. Click on 'Allow phone number access' button\n"
+    "   (We need this to confirm you're not a bot)\n"
+    "3. Share your phone number when prompted\n"
+    "4. You will receive a one-time premium group invite link\n"
+    "5. Join the group to access premium content\n\n"
+    "✅ Once both verifications are complete, you'll gain access to premium features!"
+)
+_ABOUT_TEXT = (
+    "ℹ️ *About This Bot*\n\n"
+    "This bot helps manage access to premium content and services through a secure "
+    "verification process. We provide a free trial period so you can experience our "
+    "premium features before committing to a paid plan.\n\n"
+    "Our verification system ensures that only legitimate users can access premium "
+    "content, helping us maintain quality and prevent abuse.\n\n"
+    "For support or questions, use /support to contact our team."
+)
+_SUPPORT_TEXT = (
+    "🆘 *Support*\n\n"
+    "If you can't access the premium group or need assistance, please submit this form:\n\n"
+    f"👉 {SUPPORT_FORM_URL}\n\n"
+    "Our team will contact you shortly to help resolve your issue."
+)
+_FAQ_TEXT_TMPL = (
+    "❓ *Frequently Asked Questions*\n\n"
+    "1️⃣ *How many days can I use the free trial?*\n"
+    "   You can use the free trial for {trial_days}. {trial_reason}\n\n"
+    "2️⃣ *Can I delete my information later?*\n"
+    "   Yes, absolutely! You can request deletion of your information at any time.\n\n"
+    "3️⃣ *Why do you need my phone number?*\n"
+    "   We need your phone number to verify that you're a real person and not a bot. "
+    "Your privacy is important to us, and we don't share your data with third parties.\n\n"
+    "4️⃣ *What if I can't access the premium group?*\n"
+    "   If you're having trouble accessing the group, please use /support command "
+    "to contact our team. We'll help you resolve the issue.\n\n"
+    "5️⃣ *Can I share the invite link with others?*\n"
+    "   No, the invite link is one-time use and unique to your account. "
+    "Please do not share it with others.\n\n"
+    "6️⃣ *What happens after my trial ends?*\n"
+    "   After your trial period ends, you'll need to upgrade to a paid plan "
+    "to continue accessing premium content and services."
+)
+_FAQ_TEXT_WEEKEND = _FAQ_TEXT_TMPL.format(
+    trial_days="5 days",
+    trial_reason="Since today is a weekend and the market is closed, you get 5 days of access.",
+)
+_FAQ_TEXT_WEEKDAY = _FAQ_TEXT_TMPL.format(
+    trial_days="3 days",
+    trial_reason="Since today is not a weekend, you get 3 days of access.",
+)
+
+# Static prompts shown alongside the keyboards below
+_WELCOME_TEXT = "Welcome! Tap the button below to start your free trial verification."
+_STEP1_TEXT = (
+    "Step 1: Open the verification page to pass IP and basic checks.\n"
+    "After you finish there, come back here and tap 'Continue verification'."
+)
+
+# Static keyboards, built once and shared by every handler that shows them
+_START_TRIAL_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("🎁 Get Free Trial", callback_data="start_trial")]]
+)
+_CONTINUE_VERIFICATION_ROW = [
+    InlineKeyboardButton("✅ Continue verification", callback_data="continue_verification")
+]
+# Reply-keyboard button text, matched exactly by the deny handler in main()
+_PHONE_DENY_TEXT = "❌ No thanks"
+_PHONE_SHARE_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        [KeyboardButton(text="📱 Share phone number", request_contact=True)],
+        [KeyboardButton(text=_PHONE_DENY_TEXT)],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
 
 logger.info("Bot starting...")
 logger.info(f"BASE_URL: {BASE_URL}")
@@ -158,65 +432,132 @@ elif TRIAL_CHANNEL_ID > 0:
     logger.warning(f"⚠️ TRIAL_CHANNEL_ID ({TRIAL_CHANNEL_ID}) is positive. Channels/supergroups usually have NEGATIVE IDs like -1001234567890")
 
 
-# Track last time check to detect clock manipulation
-_last_time_check: Optional[datetime] = None
+# Negative cache for "Continue verification" taps: tg_id -> monotonic expiry.
+# Repeated premature taps are answered from memory instead of hitting the API.
+# Kept short so a user who just finished the web step isn't told "not found" for long.
+_NEG_VERIF_CACHE: Dict[int, float] = {}
+_NEG_VERIF_TTL_SECONDS = 3.0
+_NEG_VERIF_SWEEP_SIZE = 1024  # Drop expired entries once the cache grows past this
+
+# Users currently shown the phone-share keyboard (step 1 passed, phone not yet shared).
+# Lets the catch-all text handler ignore everyone else without reading the pending file.
+_IN_PHONE_VERIF: set[int] = set()
+
+# Chat member statuses that count as being outside / inside the trial channel
+_OUTSIDE_STATUSES = frozenset(("left", "kicked"))
+_INSIDE_STATUSES = frozenset(("member", "administrator"))
+
+# The bot's own user id, filled once at startup by _cache_bot_id (0 until then)
+_BOT_ID: int = 0
+
+_VERIFICATION_NOT_FOUND_TEXT = (
+    "We could not find your web verification.\n"
+    "Please tap 'Get Free Trial' again and complete the web step first.\n\n"
+    "⚠️ Make sure you:\n"
+    "1. Open the verification page\n"
+    "2. Turn off VPN/Proxy\n"
+    "3. Fill in your details (name, country, email optional)\n"
+    "4. Submit the form\n"
+    "5. Close the mini-app\n"
+    "6. Then click 'Continue verification'"
+)
+
+# Last monotonic clock reading, used to detect clock regressions
+_last_mono_ns: int = 0
 
 def _now_utc() -> datetime:
-    """Get current UTC time with clock manipulation detection."""
-    global _last_time_check
-    now = datetime.now(timezone.utc)
-    
-    if _last_time_check:
-        # Check if time went backwards (clock manipulation)
-        if now < _last_time_check:
-            logger.critical(f"System clock went backwards! Previous: {_last_time_check}, Now: {now}")
-            # Use previous time + small increment to prevent issues
-            now = _last_time_check + timedelta(seconds=1)
-    
-    _last_time_check = now
-    return now
+    """
+    Get current UTC time with clock regression detection.
+    Regressions are detected on the monotonic clock so wall-clock jumps are
+    only logged, never folded into the returned value.
+    """
+    global _last_mono_ns
+    mono = time.monotonic_ns()
+    if mono < _last_mono_ns:
+        logger.critical(f"Monotonic clock went backwards! Previous: {_last_mono_ns}, Now: {mono}")
+    _last_mono_ns = mono
+    return datetime.now(timezone.utc)
 
 
 def _is_weekend(dt: datetime) -> bool:
     """
     Weekend check in local time (controlled via TIMEZONE_OFFSET_HOURS).
     """
-    local_dt = dt + timedelta(hours=TIMEZONE_OFFSET_HOURS)
-    # 5 = Saturday, 6 = Sunday
-    return local_dt.weekday() >= 5
+    local_days = (int(dt.timestamp()) + _TZ_OFFSET_SEC) // 86400
+    # 1970-01-01 was a Thursday (weekday 3); 5 = Saturday, 6 = Sunday
+    return (local_days + 3) % 7 >= 5
 
 
-def validate_trial_data(trial_data: dict, user_id: int) -> bool:
+@lru_cache(maxsize=2048)
+def _validate_trial_fields(user_id: int, join_time_str: str, total_hours_raw: str, trial_end_at_str: Optional[str], trial_end_ts: Optional[float] = None) -> bool:
     """
-    Validate trial data hasn't been tampered with.
-    Returns True if valid, False if tampered.
+    Check the time-independent parts of a trial record (end/join consistency,
+    allowed trial length). Keyed by the raw field values, so rewriting a trial
+    naturally produces a new cache entry.
     """
-    if "join_time" not in trial_data or "total_hours" not in trial_data:
-        return False
-    
     try:
-        join_time = _parse_iso_to_utc(trial_data["join_time"])
+        join_time = _parse_iso_to_utc(join_time_str)
         # Normalize total_hours to int for consistent comparisons
-        total_hours = int(float(trial_data["total_hours"]))
+        total_hours = int(float(total_hours_raw))
         
         # Calculate expected end time
         expected_end = join_time + timedelta(hours=total_hours)
         
         # If trial_end_at exists, it should match calculation (within 1 hour tolerance)
-        if "trial_end_at" in trial_data:
-            claimed_end = _parse_iso_to_utc(trial_data["trial_end_at"])
+        if trial_end_at_str is not None:
+            claimed_end = _parse_iso_to_utc(trial_end_at_str)
             time_diff = abs((claimed_end - expected_end).total_seconds())
             if time_diff > TAMPERING_TOLERANCE_SECONDS:  # More than tolerance = tampering
                 logger.warning(f"Trial data tampering detected for user {user_id}")
                 return False
         
+        # Same check for the pre-computed epoch copy of the end time
+        if trial_end_ts is not None:
+            if abs(trial_end_ts - expected_end.timestamp()) > TAMPERING_TOLERANCE_SECONDS:
+                logger.warning(f"Trial data tampering detected for user {user_id}")
+                return False
+        
         # Check total_hours is valid (3 or 5 days only)
         if total_hours not in [TRIAL_HOURS_3_DAY, TRIAL_HOURS_5_DAY]:
             logger.warning(f"Invalid total_hours ({total_hours}) for user {user_id}")
             return False
         
-        # Check join_time is not in future
-        if join_time > _now_utc():
+        return True
+    except Exception as e:
+        logger.warning(f"Error validating trial data for user {user_id}: {e}")
+        return False
+
+
+def validate_trial_data(trial_data: dict, user_id: int) -> bool:
+    """
+    Validate trial data hasn't been tampered with.
+    Returns True if valid, False if tampered.
+    """
+    if "join_time" not in trial_data or "total_hours" not in trial_data:
+        return False
+    
+    trial_end_at = trial_data.get("trial_end_at")
+    # Normalize to hashable values for the cached check; a corrupt epoch copy
+    # (e.g. a list) is ignored rather than raising out of the lru_cache call
+    trial_end_ts = trial_data.get("trial_end_ts")
+    if trial_end_ts is not None:
+        try:
+            trial_end_ts = float(trial_end_ts)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring unparseable trial_end_ts {trial_end_ts!r} for user {user_id}")
+            trial_end_ts = None
+    if not _validate_trial_fields(
+        user_id,
+        str(trial_data["join_time"]),
+        str(trial_data["total_hours"]),
+        None if trial_end_at is None else str(trial_end_at),
+        trial_end_ts,
+    ):
+        return False
+    
+    try:
+        # Check join_time is not in future (depends on the clock, so not cached)
+        if _parse_iso_to_utc(trial_data["join_time"]) > _now_utc():
             logger.warning(f"Join time in future for user {user_id}")
             return False
         
@@ -226,13 +567,147 @@ def validate_trial_data(trial_data: dict, user_id: int) -> bool:
         return False
 
 
+# Strong references to in-flight background storage writes (asyncio only keeps weak ones)
+_BACKGROUND_TASKS: set = set()
+
+
+def _on_background_write_done(task: asyncio.Task) -> None:
+    _BACKGROUND_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background {task.get_name()} failed: {task.exception()}")
+
+
+def _write_in_background(func, *args) -> None:
+    """
+    Run a blocking storage write (analytics/log only) in a worker thread without
+    awaiting it, so the handler can reply to the user first.
+    """
+    task = asyncio.create_task(asyncio.to_thread(func, *args), name=func.__name__)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_on_background_write_done)
+
+
+@dataclass(frozen=True, slots=True)
+class TrialJobData:
+    """Payload attached to each per-user reminder/trial_end job."""
+    user_id: int
+    trial_end_ts: Optional[float] = None  # Scheduled trial end (epoch seconds)
+
+
+class TrialLogBatcher:
+    """
+    Queue trial log records in memory and append them to storage in batches,
+    so a burst of joins costs one log-file rewrite instead of one per user.
+    Started in post_init and drained in post_shutdown.
+    """
+
+    def __init__(self, max_batch: int = 64, flush_interval: float = 1.0) -> None:
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.q: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        # Records taken off the queue but not yet written (kept for stop())
+        self._pending: list = []
+
+    def put(self, record: Dict[str, Any]) -> None:
+        self.q.put_nowait(record)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._flusher(), name="trial_log_flusher")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._write(self._drain())
+
+    def _drain(self) -> list:
+        batch, self._pending = self._pending, []
+        while not self.q.empty():
+            batch.append(self.q.get_nowait())
+        return batch
+
+    async def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(bulk_append_trial_log, batch)
+        except Exception as e:
+            logger.warning(f"Failed to append {len(batch)} trial log record(s): {e}")
+
+    async def _flusher(self) -> None:
+        while True:
+            self._pending.append(await self.q.get())
+            # Collect more records until the batch is full or the queue stays idle
+            while len(self._pending) < self.max_batch:
+                try:
+                    self._pending.append(await asyncio.wait_for(self.q.get(), timeout=self.flush_interval))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            await self._write(batch)
+
+
+_TRIAL_LOG = TrialLogBatcher()
+
+
+async def _edit_query_text(query, text: str) -> None:
+    """
+    Edit the callback's message, skipping the call when it already shows this text.
+    Repeated taps would otherwise get "message is not modified" 400s, which still
+    count against flood limits. Telegram trims surrounding whitespace from stored text.
+    """
+    message = query.message
+    if message is not None and getattr(message, "text", None) == text.strip():
+        return
+    await query.edit_message_text(text)
+
+
+def _get_pending(context: ContextTypes.DEFAULT_TYPE, user_id: int, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Pending verification for a user, mirrored in context.user_data once step 1 passed.
+    The web app (possibly another process) can rewrite the record at any time, so
+    the mirror only serves the phone-stage text gate; pass fresh=True wherever a
+    decision or a write-back depends on the web app's latest record.
+    """
+    data = None if fresh else context.user_data.get("pending")
+    if data is None:
+        data = get_pending_verification(user_id)
+        if data and data.get("step1_ok"):
+            context.user_data["pending"] = data
+        else:
+            context.user_data.pop("pending", None)
+    return data
+
+
+def _set_pending(context: ContextTypes.DEFAULT_TYPE, user_id: int, data: Dict[str, Any]) -> None:
+    """Persist pending verification data and keep the user_data mirror in sync."""
+    if data.get("step1_ok"):
+        context.user_data["pending"] = data
+    else:
+        context.user_data.pop("pending", None)
+    set_pending_verification(user_id, data)
+
+
+def _clear_pending(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
+    """Drop pending verification data from storage and the user_data mirror."""
+    context.user_data.pop("pending", None)
+    clear_pending_verification(user_id)
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     if not user or not update.message:
         return
 
     # Track /start command click - store user info or increment click count
-    track_start_click({
+    # (analytics only, written in the background)
+    _write_in_background(track_start_click, {
         "tg_id": user.id,
         "username": user.username,
         "first_name": user.first_name,
@@ -242,51 +717,45 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "is_bot": user.is_bot,
     })
 
+    state = get_user_state(user.id)
+
     # If user already consumed their free trial, don't allow another one
-    if has_used_trial(user.id):
-        await update.message.reply_text(
-            "You have already used your free 3-day trial once.\n\n"
-            "🎁 For more chances, you can join our giveaway channel:\n"
-            f"{GIVEAWAY_CHANNEL_URL}\n\n"
-            f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals.",
-        )
+    if state["used"]:
+        await update.message.reply_text(_ALREADY_USED_MSG)
         return
 
     # Check if user has an ACTIVE trial (currently in trial period)
-    active_trial = get_active_trial(user.id)
+    active_trial = state["active"]
     if active_trial and "join_time" in active_trial and "total_hours" in active_trial:
         try:
-            join_time = _parse_iso_to_utc(active_trial["join_time"])
+            join_ts = _parse_iso_to_utc(active_trial["join_time"]).timestamp()
             total_hours = float(active_trial["total_hours"])
-            trial_end_at = join_time + timedelta(hours=total_hours)
-            now = _now_utc()
+            now_ts = _now_utc().timestamp()
+            end_ts = join_ts + total_hours * 3600.0
             
             # If trial hasn't ended yet, user is still in active trial
-            if now < trial_end_at:
-                elapsed_hours = (now - join_time).total_seconds() / 3600.0
+            if now_ts < end_ts:
+                elapsed_hours = (now_ts - join_ts) / 3600.0
                 remaining_hours = total_hours - elapsed_hours
                 elapsed_rounded = round(elapsed_hours, 1)
                 remaining_rounded = round(remaining_hours, 1)
                 total_days = int(total_hours / 24)
                 
                 await update.message.reply_text(
-                    f"✅ You are currently in your {total_days}-day free trial!\n\n"
-                    f"⏱ Time elapsed: {elapsed_rounded} hours\n"
-                    f"⏳ Time remaining: {remaining_rounded} hours\n\n"
-                    "You will receive reminders as your trial approaches the end.\n\n"
-                    f"💬 Questions? DM {SUPPORT_CONTACT}",
+                    _ACTIVE_TRIAL_STATUS_TMPL.format_map({
+                        "total_days": total_days,
+                        "elapsed": elapsed_rounded,
+                        "remaining": remaining_rounded,
+                    }),
                 )
                 return
         except Exception as e:
             logger.warning(f"Error checking active trial for user {user.id}: {e}")
             # Continue to show normal start message if check fails
 
-    keyboard = [
-        [InlineKeyboardButton("🎁 Get Free Trial", callback_data="start_trial")],
-    ]
     await update.message.reply_text(
-        "Welcome! Tap the button below to start your free trial verification.",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        _WELCOME_TEXT,
+        reply_markup=_START_TRIAL_KEYBOARD,
     )
 
 
@@ -301,39 +770,36 @@ async def start_trial_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     tg_id = user.id
 
+    state = get_user_state(tg_id)
+
     # Check if user already consumed their free trial BEFORE showing verification page
-    if has_used_trial(tg_id):
-        await query.edit_message_text(
-            "You have already used your free 3-day trial once.\n\n"
-            "🎁 For more chances, you can join our giveaway channel:\n"
-            f"{GIVEAWAY_CHANNEL_URL}\n\n"
-            f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals.",
-        )
+    if state["used"]:
+        await _edit_query_text(query, _ALREADY_USED_MSG)
         return
 
     # Check if user has an ACTIVE trial (currently in trial period)
-    active_trial = get_active_trial(tg_id)
+    active_trial = state["active"]
     if active_trial and "join_time" in active_trial and "total_hours" in active_trial:
         try:
-            join_time = _parse_iso_to_utc(active_trial["join_time"])
+            join_ts = _parse_iso_to_utc(active_trial["join_time"]).timestamp()
             total_hours = float(active_trial["total_hours"])
-            trial_end_at = join_time + timedelta(hours=total_hours)
-            now = _now_utc()
+            now_ts = _now_utc().timestamp()
+            end_ts = join_ts + total_hours * 3600.0
             
             # If trial hasn't ended yet, user is still in active trial
-            if now < trial_end_at:
-                elapsed_hours = (now - join_time).total_seconds() / 3600.0
+            if now_ts < end_ts:
+                elapsed_hours = (now_ts - join_ts) / 3600.0
                 remaining_hours = total_hours - elapsed_hours
                 elapsed_rounded = round(elapsed_hours, 1)
                 remaining_rounded = round(remaining_hours, 1)
                 total_days = int(total_hours / 24)
                 
                 await query.edit_message_text(
-                    f"✅ You are currently in your {total_days}-day free trial!\n\n"
-                    f"⏱ Time elapsed: {elapsed_rounded} hours\n"
-                    f"⏳ Time remaining: {remaining_rounded} hours\n\n"
-                    "You will receive reminders as your trial approaches the end.\n\n"
-                    f"💬 Questions? DM {SUPPORT_CONTACT}",
+                    _ACTIVE_TRIAL_STATUS_TMPL.format_map({
+                        "total_days": total_days,
+                        "elapsed": elapsed_rounded,
+                        "remaining": remaining_rounded,
+                    }),
                 )
                 return
         except Exception as e:
@@ -341,27 +807,25 @@ async def start_trial_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             # Continue to show verification page if check fails
 
     # Build URL - use Web App if HTTPS, fallback to regular URL if HTTP
-    # Telegram Web Apps require HTTPS, so we check BASE_URL scheme
-    trial_url = f"{BASE_URL.rstrip('/')}/trial?tg_id={tg_id}"
+    # Include tg_id in URL as fallback in case JavaScript extraction fails
+    trial_url = _TRIAL_URL_TMPL.format(tg_id)
     
-    # Check if BASE_URL uses HTTPS
-    if BASE_URL.startswith("https://"):
+    if _USE_WEBAPP:
         # Use Web App (opens as popup inside Telegram)
-        # Include tg_id in URL as fallback in case JavaScript extraction fails
-        button = InlineKeyboardButton("🌐 Open verification page", web_app=WebAppInfo(url=f"{BASE_URL.rstrip('/')}/trial?tg_id={tg_id}"))
+        button = InlineKeyboardButton("🌐 Open verification page", web_app=WebAppInfo(url=trial_url))
     else:
         # Fallback to regular URL button (opens in external browser)
         # This is needed because Telegram Web Apps require HTTPS
         button = InlineKeyboardButton("🌐 Open verification page", url=trial_url)
 
+    # Only the verification button is per-user (it carries tg_id in the URL)
     keyboard = [
         [button],
-        [InlineKeyboardButton("✅ Continue verification", callback_data="continue_verification")],
+        _CONTINUE_VERIFICATION_ROW,
     ]
 
     await query.edit_message_text(
-        "Step 1: Open the verification page to pass IP and basic checks.\n"
-        "After you finish there, come back here and tap 'Continue verification'.",
+        _STEP1_TEXT,
         reply_markup=InlineKeyboardMarkup(keyboard),
     )
 
@@ -377,41 +841,55 @@ async def continue_verification_callback(update: Update, context: ContextTypes.D
         return
     tg_id = user.id
 
+    # User was just told they are not verified - answer from memory
+    now_mono = time.monotonic()
+    neg_expiry = _NEG_VERIF_CACHE.get(tg_id)
+    if neg_expiry is not None:
+        if neg_expiry > now_mono:
+            logger.debug(f"Negative verification cache hit for tg_id={tg_id}")
+            await _edit_query_text(query, _VERIFICATION_NOT_FOUND_TEXT)
+            return
+        del _NEG_VERIF_CACHE[tg_id]
+
     # Try to get data from local storage first (same machine)
-    data = get_pending_verification(tg_id)
+    data = _get_pending(context, tg_id, fresh=True)
     logger.debug(f"Continue verification check for tg_id={tg_id}: local data found = {data is not None}")
     
     # If not found locally, try to fetch from web app API.
     # This works even if web app and bot are on separate processes / machines,
     # as long as BASE_URL points to your HTTPS domain on the droplet.
-    if not data or not data.get("step1_ok"):
+    if data and not data.get("step1_ok") and data.get("step1_final"):
+        # Web app explicitly rejected step 1 - a remote fetch won't change that
+        logger.debug(f"Step 1 marked as final failure locally for tg_id={tg_id}, skipping API")
+    elif not data or not data.get("step1_ok"):
         logger.debug("Local data missing or step1_ok=False, trying web app API...")
         try:
-            import aiohttp
-            api_url = f"{BASE_URL.rstrip('/')}/api/get-verification?tg_id={tg_id}"
+            api_url = _VERIFY_API_URL_TMPL.format(tg_id)
             logger.debug(f"Trying to fetch from web app API: {api_url}")
-            headers = {}
-            if API_SECRET:
-                # Use header-only authentication (more secure than URL query string)
-                headers["X-API-Secret"] = API_SECRET
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        if result.get("success") and result.get("data"):
-                            data = result["data"]
-                            logger.debug(f"Got data from web app API for tg_id={tg_id}")
-                            logger.debug(f"Data keys: {list(data.keys())}, step1_ok: {data.get('step1_ok')}")
-                            # Also save locally for future use
-                            set_pending_verification(tg_id, data)
-                        else:
-                            logger.debug("API returned success=False or no data")
-                    elif resp.status == 401:
-                        logger.warning("API authentication failed - check API_SECRET")
-                    elif resp.status == 429:
-                        logger.warning("API rate limited")
+            session = context.application.bot_data["http"]
+            async with session.get(api_url, headers=_API_HEADERS) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    if result.get("success") and result.get("data"):
+                        data = result["data"]
+                        logger.debug(f"Got data from web app API for tg_id={tg_id}")
+                        logger.debug(f"Data keys: {list(data.keys())}, step1_ok: {data.get('step1_ok')}")
+                        # Save locally only once step 1 passed: the web app lets blocked
+                        # users resubmit, so a cached failure (step1_final) would stop
+                        # this branch from ever asking the API again
+                        if data.get("step1_ok"):
+                            _set_pending(context, tg_id, data)
                     else:
-                        logger.debug(f"API returned status {resp.status}")
+                        logger.debug("API returned success=False or no data")
+                elif resp.status == 401:
+                    logger.warning("API authentication failed - check API_SECRET")
+                elif resp.status == 429:
+                    logger.warning("API rate limited")
+                else:
+                    logger.debug(f"API returned status {resp.status}")
+        except asyncio.TimeoutError:
+            # Expected when the web app is slow; no traceback needed
+            logger.warning(f"Web app API timed out for tg_id={tg_id}")
         except Exception as e:
             logger.warning(f"Could not fetch from API: {e}", exc_info=True)
             # Continue with local check
@@ -420,36 +898,25 @@ async def continue_verification_callback(update: Update, context: ContextTypes.D
     
     if not data or not data.get("step1_ok"):
         logger.debug(f"No valid verification data found for tg_id={tg_id}")
-        await query.edit_message_text(
-            "We could not find your web verification.\n"
-            "Please tap 'Get Free Trial' again and complete the web step first.\n\n"
-            "⚠️ Make sure you:\n"
-            "1. Open the verification page\n"
-            "2. Turn off VPN/Proxy\n"
-            "3. Fill in your details (name, country, email optional)\n"
-            "4. Submit the form\n"
-            "5. Close the mini-app\n"
-            "6. Then click 'Continue verification'"
-        )
+        if len(_NEG_VERIF_CACHE) >= _NEG_VERIF_SWEEP_SIZE:
+            # Users who tapped early and never came back would otherwise stay forever
+            for stale_id in [k for k, exp in _NEG_VERIF_CACHE.items() if exp <= now_mono]:
+                del _NEG_VERIF_CACHE[stale_id]
+        _NEG_VERIF_CACHE[tg_id] = now_mono + _NEG_VERIF_TTL_SECONDS
+        await _edit_query_text(query, _VERIFICATION_NOT_FOUND_TEXT)
         return
     
+    _NEG_VERIF_CACHE.pop(tg_id, None)
+    _IN_PHONE_VERIF.add(tg_id)
     logger.info(f"Verification Step 1 confirmed passed for tg_id={tg_id}")
 
-    contact_button = KeyboardButton(text="📱 Share phone number", request_contact=True)
-    deny_button = KeyboardButton(text="❌ No thanks")
-    keyboard = ReplyKeyboardMarkup(
-        [[contact_button], [deny_button]], 
-        resize_keyboard=True, 
-        one_time_keyboard=True
-    )
-
     await query.message.reply_text(
         "Step 1 passed ✅.\n\n"
         "Step 2: Please share your phone number using the button below.\n\n"
         "We use your name, country, and phone number only for verification, "
         "security and internal analytics. We do not sell or share this data. "
         "You can request deletion at any time.",
-        reply_markup=keyboard,
+        reply_markup=_PHONE_SHARE_KEYBOARD,
     )
 
 
@@ -457,17 +924,11 @@ async def retry_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     """
     Simple /retry command to re-show the contact request keyboard if user cancelled.
     """
-    contact_button = KeyboardButton(text="📱 Share phone number", request_contact=True)
-    deny_button = KeyboardButton(text="❌ No thanks")
-    keyboard = ReplyKeyboardMarkup(
-        [[contact_button], [deny_button]], 
-        resize_keyboard=True, 
-        one_time_keyboard=True
-    )
-
+    if update.effective_user:
+        _IN_PHONE_VERIF.add(update.effective_user.id)
     await update.message.reply_text(
         "Let's try again. Please share your phone number using the button below.",
-        reply_markup=keyboard,
+        reply_markup=_PHONE_SHARE_KEYBOARD,
     )
 
 
@@ -479,6 +940,7 @@ async def phone_deny_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     user = update.effective_user
+    _IN_PHONE_VERIF.discard(user.id)
     logger.info(f"User {user.id} denied phone verification")
     
     await update.message.reply_text(
@@ -497,96 +959,24 @@ async def phone_deny_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Help command explaining the bot and verification process."""
-    help_text = (
-        "🤖 *About This Bot*\n\n"
-        "This bot is used to manage users accessing premium content and services.\n\n"
-        "📋 *Available Commands:*\n"
-        "• /start - Start the bot and begin free trial\n"
-        "• /help - Help and commands list\n"
-        "• /faq - Frequently asked questions\n"
-        "• /about - About this bot\n"
-        "• /support - Contact support\n\n"
-        "🔐 *Verification Process:*\n\n"
-        "*Step 1: Initial Verification*\n"
-        "1. Click on /start command\n"
-        "2. A 'Get Free Trial' button will appear\n"
-        "3. Click on the button to open the verification page\n"
-        "4. Turn off VPN/Proxy before proceeding\n"
-        "5. IP test will happen automatically\n"
-        "6. Fill in your details:\n"
-        "   • Name (required)\n"
-        "   • Country (required)\n"
-        "   • Email (optional - you can delete later)\n"
-        "7. Close the Telegram mini-app\n\n"
-        "*Step 2: Phone Verification*\n"
-        "1. If Step 1 passed, click on 'Continue verification'\n"
-        "2. Click on 'Allow phone number access' button\n"
-        "   (We need this to confirm you're not a bot)\n"
-        "3. Share your phone number when prompted\n"
-        "4. You will receive a one-time premium group invite link\n"
-        "5. Join the group to access premium content\n\n"
-        "✅ Once both verifications are complete, you'll gain access to premium features!"
-    )
-    await update.message.reply_text(help_text, parse_mode="Markdown")
+    await update.message.reply_text(_HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
 
 
 async def faq_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """FAQ command with frequently asked questions."""
-    now = _now_utc()
-    is_weekend = _is_weekend(now)
-    
-    if is_weekend:
-        trial_days = "5 days"
-        trial_reason = "Since today is a weekend and the market is closed, you get 5 days of access."
-    else:
-        trial_days = "3 days"
-        trial_reason = "Since today is not a weekend, you get 3 days of access."
-    
-    faq_text = (
-        "❓ *Frequently Asked Questions*\n\n"
-        "1️⃣ *How many days can I use the free trial?*\n"
-        f"   You can use the free trial for {trial_days}. {trial_reason}\n\n"
-        "2️⃣ *Can I delete my information later?*\n"
-        "   Yes, absolutely! You can request deletion of your information at any time.\n\n"
-        "3️⃣ *Why do you need my phone number?*\n"
-        "   We need your phone number to verify that you're a real person and not a bot. "
-        "Your privacy is important to us, and we don't share your data with third parties.\n\n"
-        "4️⃣ *What if I can't access the premium group?*\n"
-        "   If you're having trouble accessing the group, please use /support command "
-        "to contact our team. We'll help you resolve the issue.\n\n"
-        "5️⃣ *Can I share the invite link with others?*\n"
-        "   No, the invite link is one-time use and unique to your account. "
-        "Please do not share it with others.\n\n"
-        "6️⃣ *What happens after my trial ends?*\n"
-        "   After your trial period ends, you'll need to upgrade to a paid plan "
-        "to continue accessing premium content and services."
-    )
-    await update.message.reply_text(faq_text, parse_mode="Markdown")
+    # Trial length depends on whether today is a weekend; both variants are prebuilt
+    faq_text = _FAQ_TEXT_WEEKEND if _is_weekend(_now_utc()) else _FAQ_TEXT_WEEKDAY
+    await update.message.reply_text(faq_text, parse_mode=ParseMode.MARKDOWN)
 
 
 async def about_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """About command with brief description of the bot."""
-    about_text = (
-        "ℹ️ *About This Bot*\n\n"
-        "This bot helps manage access to premium content and services through a secure "
-        "verification process. We provide a free trial period so you can experience our "
-        "premium features before committing to a paid plan.\n\n"
-        "Our verification system ensures that only legitimate users can access premium "
-        "content, helping us maintain quality and prevent abuse.\n\n"
-        "For support or questions, use /support to contact our team."
-    )
-    await update.message.reply_text(about_text, parse_mode="Markdown")
+    await update.message.reply_text(_ABOUT_TEXT, parse_mode=ParseMode.MARKDOWN)
 
 
 async def support_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Support command with contact form link."""
-    support_text = (
-        "🆘 *Support*\n\n"
-        "If you can't access the premium group or need assistance, please submit this form:\n\n"
-        f"👉 {SUPPORT_FORM_URL}\n\n"
-        "Our team will contact you shortly to help resolve your issue."
-    )
-    await update.message.reply_text(support_text, parse_mode="Markdown")
+    await update.message.reply_text(_SUPPORT_TEXT, parse_mode=ParseMode.MARKDOWN)
 
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -602,15 +992,11 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # For now, show to everyone but you may want to restrict it
     
     try:
-        from storage import get_all_active_trials, USED_TRIALS_FILE, ACTIVE_TRIALS_FILE
-        import os
-        
         active_trials = get_all_active_trials()
         
         # Count used trials
         used_trials_count = 0
         try:
-            import json
             if os.path.exists(USED_TRIALS_FILE):
                 with open(USED_TRIALS_FILE, 'r') as f:
                     used_data = json.load(f)
@@ -625,10 +1011,10 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # List pending jobs with their scheduled times
         job_list = []
         for job in jobs[:10]:  # Show max 10 jobs
-            if job.data and "user_id" in job.data:
+            if isinstance(job.data, TrialJobData):
                 next_run = job.next_t.strftime("%Y-%m-%d %H:%M:%S UTC") if job.next_t else "unknown"
                 job_name = job.name or job.callback.__name__ if job.callback else "unknown"
-                job_list.append(f"  • User {job.data['user_id']}: {job_name} at {next_run}")
+                job_list.append(f"  • User {job.data.user_id}: {job_name} at {next_run}")
         
         # Check if files exist and are writable
         files_status = []
@@ -660,7 +1046,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             if job_count > 10:
                 status_text += f"\n  ... and {job_count - 10} more"
         
-        await update.message.reply_text(status_text, parse_mode="Markdown")
+        await update.message.reply_text(status_text, parse_mode=ParseMode.MARKDOWN)
         
     except Exception as e:
         logger.error(f"Error in status_command: {e}", exc_info=True)
@@ -734,33 +1120,35 @@ async def text_during_phone_verification_handler(update: Update, context: Contex
         return
     
     user = update.effective_user
+    # Most text comes from users who were never shown the phone keyboard
+    if user.id not in _IN_PHONE_VERIF:
+        return
     message_text = update.message.text or ""
     
     # Check if user is in the phone verification stage
     # (has completed step1 but hasn't verified phone yet)
-    data = get_pending_verification(user.id)
+    data = _get_pending(context, user.id)
     
     if data and data.get("step1_ok") and data.get("status") != "verified":
         # User is in phone verification stage but sent text instead of clicking button
         logger.info(f"User {user.id} sent text '{message_text[:50]}...' during phone verification stage")
         
         # Check if it looks like they typed a phone number
-        import re
-        looks_like_phone = bool(re.search(r'[\d\+\-\(\)\s]{7,}', message_text))
+        looks_like_phone = bool(_PHONE_LIKE_RE.search(message_text))
         
         if looks_like_phone:
             await update.message.reply_text(
                 "⚠️ Please don't type your phone number!\n\n"
                 "For security, we need you to use Telegram's official phone sharing button.\n\n"
                 "👇 Click the **'📱 Share phone number'** button below to continue.",
-                parse_mode="Markdown"
+                parse_mode=ParseMode.MARKDOWN
             )
         else:
             await update.message.reply_text(
                 "⚠️ Please use the button to share your phone number.\n\n"
                 "👇 Click the **'📱 Share phone number'** button below to continue verification.\n\n"
                 "If you don't see the button, type /retry to show it again.",
-                parse_mode="Markdown"
+                parse_mode=ParseMode.MARKDOWN
             )
         return
     
@@ -779,31 +1167,31 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     logger.info(f"Contact handler triggered for user {user.id} ({user.username})")
+    now = _now_utc()
+
+    state = get_user_state(user.id)
 
     # CRITICAL: Check if user has already used their trial FIRST
     # This prevents the exploit where users click "Share phone number" button repeatedly
-    if has_used_trial(user.id):
+    if state["used"]:
         logger.warning(f"User {user.id} tried to share phone but already used trial")
         await update.message.reply_text(
-            "You have already used your free 3-day trial once.\n\n"
-            "🎁 For more chances, you can join our giveaway channel:\n"
-            f"{GIVEAWAY_CHANNEL_URL}\n\n"
-            f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals.",
+            _ALREADY_USED_MSG,
             reply_markup=ReplyKeyboardRemove(),  # Remove the keyboard
         )
         return
 
     # Check if user has an ACTIVE trial (already in channel)
-    active_trial = get_active_trial(user.id)
+    active_trial = state["active"]
     if active_trial and "join_time" in active_trial and "total_hours" in active_trial:
         try:
-            join_time = _parse_iso_to_utc(active_trial["join_time"])
+            join_ts = _parse_iso_to_utc(active_trial["join_time"]).timestamp()
             total_hours = float(active_trial["total_hours"])
-            trial_end_at = join_time + timedelta(hours=total_hours)
-            now = _now_utc()
+            now_ts = now.timestamp()
+            end_ts = join_ts + total_hours * 3600.0
             
-            if now < trial_end_at:
-                elapsed_hours = (now - join_time).total_seconds() / 3600.0
+            if now_ts < end_ts:
+                elapsed_hours = (now_ts - join_ts) / 3600.0
                 remaining_hours = total_hours - elapsed_hours
                 elapsed_rounded = round(elapsed_hours, 1)
                 remaining_rounded = round(remaining_hours, 1)
@@ -811,10 +1199,11 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 
                 logger.warning(f"User {user.id} tried to share phone but already has active trial")
                 await update.message.reply_text(
-                    f"✅ You are already in your {total_days}-day free trial!\n\n"
-                    f"⏱ Time elapsed: {elapsed_rounded} hours\n"
-                    f"⏳ Time remaining: {remaining_rounded} hours\n\n"
-                    "No need to verify again - you're already in the trial channel!",
+                    _ALREADY_IN_TRIAL_TMPL.format_map({
+                        "total_days": total_days,
+                        "elapsed": elapsed_rounded,
+                        "remaining": remaining_rounded,
+                    }),
                     reply_markup=ReplyKeyboardRemove(),  # Remove the keyboard
                 )
                 return
@@ -838,13 +1227,16 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not phone.startswith("+"):
         phone = "+" + phone
 
-    data = get_pending_verification(user.id) or {}
+    # Re-read storage: the web app may have rejected step 1 since the mirror was filled
+    data = _get_pending(context, user.id, fresh=True) or {}
 
     # Block phone numbers by country code (configurable via env BLOCKED_PHONE_COUNTRY_CODE, default +91)
-    if BLOCKED_PHONE_COUNTRY_CODE and phone.startswith(BLOCKED_PHONE_COUNTRY_CODE):
+    if _BLOCKED_PHONE_CODES and phone.startswith(_BLOCKED_PHONE_CODES):
         data["status"] = "blocked_phone_india"
         data["phone"] = phone
-        set_pending_verification(user.id, data)
+        _set_pending(context, user.id, data)
+        # Done with the phone stage; the text handler should ignore them again
+        _IN_PHONE_VERIF.discard(user.id)
 
         await update.message.reply_text(
             "You are not eligible for this trial with this phone number.\n"
@@ -857,11 +1249,10 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Passed phone check
     data["status"] = "verified"
     data["phone"] = phone
-    set_pending_verification(user.id, data)
+    _set_pending(context, user.id, data)
 
     # Before generating a new invite link, check if user recently generated one
     # Use atomic function to prevent race condition (multiple rapid clicks)
-    now = _now_utc()
     existing_link = get_valid_invite_link(user.id, now)
     
     # Send message if existing link is valid
@@ -881,11 +1272,12 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     bot = context.bot
     try:
         # Expire invite link after configured hours
-        expires_at_dt = now + timedelta(hours=INVITE_LINK_EXPIRY_HOURS)
+        now_ts = int(now.timestamp())
+        expires_ts = now_ts + _INVITE_EXPIRY_SECS
         invite_link = await bot.create_chat_invite_link(
             chat_id=TRIAL_CHANNEL_ID,
             member_limit=1,
-            expire_date=int(expires_at_dt.timestamp()),
+            expire_date=expires_ts,
         )
         logger.info(f"Created invite link for user {user.id}: {invite_link.invite_link}")
     except Exception as e:  # pragma: no cover - defensive
@@ -902,7 +1294,10 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         {
             "invite_link": invite_link.invite_link,
             "invite_created_at": now.isoformat(),
-            "invite_expires_at": expires_at_dt.isoformat(),
+            "invite_expires_at": (now + _INVITE_EXPIRY_DELTA).isoformat(),
+            # Epoch copies so expiry checks are a plain integer compare
+            "invite_created_ts": now_ts,
+            "invite_expires_ts": expires_ts,
         },
     )
 
@@ -914,7 +1309,7 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     )
 
     # Log minimal info for your records
-    append_trial_log(
+    _TRIAL_LOG.put(
         {
             "tg_id": user.id,
             "username": user.username,
@@ -922,79 +1317,197 @@ async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "country": data.get("country"),
             "phone": phone,
             "marketing_opt_in": data.get("marketing_opt_in", False),
-            "verification_completed_at": _now_utc().isoformat(),
+            "verification_completed_at": now.isoformat(),
         }
     )
 
     # Clear pending verification record now that verification is complete
-    clear_pending_verification(user.id)
+    _clear_pending(context, user.id)
+    _IN_PHONE_VERIF.discard(user.id)
+
+
+def _trial_end_ts(info: Dict[str, Any]) -> Optional[float]:
+    """
+    Return the trial's end as an epoch timestamp, or None if missing/unparseable.
+    Uses the stored trial_end_ts when present (written by start_trial_session)
+    and only falls back to parsing trial_end_at for older records.
+    """
+    trial_end_ts = info.get("trial_end_ts")
+    trial_end_at_str = info.get("trial_end_at")
+    try:
+        if trial_end_ts is not None:
+            return float(trial_end_ts)
+        if not trial_end_at_str:
+            return None
+        return _parse_iso_to_utc(trial_end_at_str).timestamp()
+    except Exception as e:
+        logger.warning(f"Unparseable trial end ({trial_end_ts!r} / {trial_end_at_str!r}): {e}")
+        return None
+
+
+async def _kick_from_trial_channel(bot: Bot, user_id: int) -> None:
+    """
+    Remove a user from the trial channel without a lasting ban.
+    The unban is awaited after the ban: sent concurrently it could land first
+    and leave the user permanently banned. Callers gather this with the DM.
+    """
+    await bot.ban_chat_member(TRIAL_CHANNEL_ID, user_id)
+    await bot.unban_chat_member(TRIAL_CHANNEL_ID, user_id)
 
 
 async def periodic_trial_cleanup(context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Periodic cleanup job that runs every hour to check all active trials
-    and end expired ones. This is a fallback in case scheduled jobs fail.
+    Periodic cleanup job that runs every CLEANUP_INTERVAL_HOURS to check all
+    active trials and end expired ones. This is a fallback in case scheduled jobs fail.
+    Expired users are processed concurrently (bounded by _CLEANUP_CONCURRENCY).
     """
     now = _now_utc()
-    active_trials = get_all_active_trials()
+    now_ts = now.timestamp()
+    # Served from the storage snapshot; only expired/invalid users touch storage below
+    active_trials = get_all_active_trials_typed()
     
     cleaned_count = 0
-    for tg_id_str, info in active_trials.items():
-        try:
-            user_id = int(tg_id_str)
-            
-            # Validate trial data first
-            if not validate_trial_data(info, user_id):
-                logger.warning(f"Invalid trial data for user {user_id}, cleaning up")
-                clear_active_trial(user_id)
-                cleaned_count += 1
-                continue
-            
-            trial_end_at_str = info.get("trial_end_at")
-            if not trial_end_at_str:
-                continue
-            
-            end_at = _parse_iso_to_utc(trial_end_at_str)
-            
-            # If trial expired, end it now
-            if now >= end_at:
-                # Mark as used
-                mark_trial_used(user_id, {
+    valid_trials = []
+    for user_id, info in active_trials.items():
+        # Validate trial data first
+        if not validate_trial_data(info, user_id):
+            logger.warning(f"Invalid trial data for user {user_id}, cleaning up")
+            clear_active_trial(user_id)
+            _cancel_trial_jobs(context.job_queue, user_id)
+            cleaned_count += 1
+            continue
+        valid_trials.append((user_id, info))
+    
+    # If trial expired, end it below
+    expired_ids = [
+        user_id for user_id, info in valid_trials
+        if (end_ts := _trial_end_ts(info)) is not None and end_ts <= now_ts
+    ]
+    
+    if expired_ids:
+        sem = asyncio.Semaphore(_CLEANUP_CONCURRENCY)
+        
+        async def _end_expired_trial(user_id: int) -> None:
+            async with sem:
+                # Mark as used and clear the active trial in one storage step
+                finalize_trial(user_id, {
                     "trial_ended_at": now.isoformat(),
                     "ended_by": "periodic_cleanup"
                 })
+                _cancel_trial_jobs(context.job_queue, user_id)
                 
-                # Remove from channel
-                try:
-                    await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user_id)
-                    await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user_id)
-                except Exception:
-                    pass
-                
-                # Clear active trial
-                clear_active_trial(user_id)
-                cleaned_count += 1
-                
-                # Notify user
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=(
-                            "⛔ Your trial has finished. If you enjoyed the signals, you can upgrade "
-                            "to a paid plan to continue."
-                        ),
-                    )
-                except Exception:
-                    pass
-                
+                # Kick from channel and notify user at the same time (failures are logged)
+                kick_result, send_result = await asyncio.gather(
+                    _kick_from_trial_channel(context.bot, user_id),
+                    context.bot.send_message(chat_id=user_id, text=_TRIAL_FINISHED_MSG),
+                    return_exceptions=True,
+                )
+                if isinstance(kick_result, Exception):
+                    logger.warning(f"Could not remove user {user_id} from trial channel: {kick_result}")
+                if isinstance(send_result, Exception):
+                    logger.warning(f"Could not send trial finished message to user {user_id}: {send_result}")
                 logger.info(f"Cleaned up expired trial for user {user_id}")
-        except Exception as e:
-            logger.warning(f"Error in periodic cleanup for {tg_id_str}: {e}")
+        
+        results = await asyncio.gather(
+            *(_end_expired_trial(user_id) for user_id in expired_ids),
+            return_exceptions=True,
+        )
+        for user_id, result in zip(expired_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Error in periodic cleanup for {user_id}: {result}")
+            else:
+                cleaned_count += 1
     
     if cleaned_count > 0:
         logger.info(f"Periodic cleanup: Ended {cleaned_count} expired trial(s)")
 
 
+async def _reject_used_trial(bot: Bot, user_id: int, text: str = _REJECT_USED_TRIAL_MSG) -> None:
+    """DM a user who already used their trial and remove them from the trial channel."""
+    send_result, kick_result = await asyncio.gather(
+        bot.send_message(chat_id=user_id, text=text),
+        _kick_from_trial_channel(bot, user_id),
+        return_exceptions=True,
+    )
+    if isinstance(send_result, Exception):
+        logger.warning(f"Could not send used-trial notice to user {user_id}: {send_result}")
+    if isinstance(kick_result, Exception):
+        logger.warning(f"Could not remove user {user_id} from trial channel: {kick_result}")
+
+
+def _trial_cooldown_remaining(user_id: int, now: datetime) -> Optional[timedelta]:
+    """
+    Decide whether a previous trial blocks this user from starting a new one.
+    Returns None if there is no prior trial (or its cooldown has elapsed),
+    the remaining cooldown if still within TRIAL_COOLDOWN_DAYS, or
+    timedelta(0) if the prior trial's end date is missing/unparseable
+    (block to be safe).
+    """
+    if not has_used_trial(user_id):
+        return None
+    
+    user_trial_info = get_used_trial_info(user_id)
+    # Should not happen if has_used_trial returned True, but block to be safe
+    trial_ended_at_str = user_trial_info and (
+        user_trial_info.get("trial_ended_at") or user_trial_info.get("left_early_at")
+    )
+    if not trial_ended_at_str:
+        return timedelta(0)
+    
+    try:
+        ended_at = _parse_iso_to_utc(trial_ended_at_str)
+    except Exception:
+        return timedelta(0)
+    
+    remaining = ended_at + timedelta(days=TRIAL_COOLDOWN_DAYS) - now
+    return remaining if remaining > timedelta(0) else None
+
+
+async def start_trial_session(user: User, context: ContextTypes.DEFAULT_TYPE, now: datetime) -> None:
+    """
+    Start a trial for a user who just joined the trial channel: pick the trial
+    length, persist it, log it, welcome the user and schedule reminders.
+    Callers are responsible for the used-trial and already-running checks.
+    """
+    # Determine trial duration based on weekend
+    if _is_weekend(now):
+        trial_days = 5
+        total_hours = TRIAL_HOURS_5_DAY
+    else:
+        trial_days = 3
+        total_hours = TRIAL_HOURS_3_DAY
+
+    trial_end_at = now + timedelta(hours=total_hours)
+
+    # Track active trial so we can compute remaining hours if user leaves early and restore after restart
+    set_active_trial(
+        user.id,
+        {
+            "join_time": now.isoformat(),
+            "total_hours": total_hours,
+            "trial_end_at": trial_end_at.isoformat(),
+            "trial_end_ts": int(trial_end_at.timestamp()),
+        },
+    )
+
+    _TRIAL_LOG.put(
+        {
+            "tg_id": user.id,
+            "username": user.username,
+            "join_time": now.isoformat(),
+            "trial_days": trial_days,
+        }
+    )
+
+    await context.bot.send_message(
+        chat_id=user.id,
+        text=_TRIAL_STARTED_TMPL.format_map({"trial_days": trial_days, "total_hours": total_hours}),
+    )
+
+    logger.info("Scheduling reminder jobs for user %s (%s-day trial)", user.id, trial_days)
+    _schedule_trial_jobs(context.job_queue, user.id, trial_days, trial_end_at.timestamp())
+
+
 async def trial_chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle chat member updates (join/leave) in the trial channel."""
     logger.info("=== trial_chat_member_update TRIGGERED ===")
@@ -1006,245 +1519,76 @@ async def trial_chat_member_update(update: Update, context: ContextTypes.DEFAULT
     chat_member = update.chat_member
     chat = chat_member.chat
 
-    logger.info(f"Chat member update: chat_id={chat.id}, chat_title={chat.title}, TRIAL_CHANNEL_ID={TRIAL_CHANNEL_ID}")
+    logger.info("Chat member update: chat_id=%s, chat_title=%s, TRIAL_CHANNEL_ID=%s", chat.id, chat.title, TRIAL_CHANNEL_ID)
     
     if chat.id != TRIAL_CHANNEL_ID:
-        logger.info(f"Ignoring chat member update for chat_id={chat.id} (not trial channel {TRIAL_CHANNEL_ID})")
+        logger.info("Ignoring chat member update for chat_id=%s (not trial channel %s)", chat.id, TRIAL_CHANNEL_ID)
         return
 
     old = chat_member.old_chat_member
     new = chat_member.new_chat_member
     
-    logger.info(f"Member status change: user={new.user.id if new.user else 'None'}, old_status={old.status}, new_status={new.status}")
+    logger.info("Member status change: user=%s, old_status=%s, new_status=%s", new.user.id if new.user else 'None', old.status, new.status)
+    # One timestamp for the whole update (join start time / leave usage and marker)
+    now = _now_utc()
 
     # Detect join: previously left/kicked, now member/admin
-    if old.status in ("left", "kicked") and new.status in ("member", "administrator"):
+    if old.status in _OUTSIDE_STATUSES and new.status in _INSIDE_STATUSES:
         user = new.user
         if not user:
             logger.warning("new.user is None in trial_chat_member_update (join)")
             return
         
-        logger.info(f"=== USER JOIN DETECTED ===")
-        logger.info(f"User {user.id} ({user.username}) joined trial channel")
-        now = _now_utc()
+        logger.info("=== USER JOIN DETECTED ===")
+        logger.info("User %s (%s) joined trial channel", user.id, user.username)
 
         # Check if user has already used a trial (prevent rejoin extension exploit)
-        if has_used_trial(user.id):
-            # User already used trial - check if enough time has passed (30 day cooldown)
-            user_trial_info = get_used_trial_info(user.id)
-            if not user_trial_info:
-                # Should not happen if has_used_trial returned True, but block to be safe
-                await context.bot.send_message(
-                    chat_id=user.id,
-                    text=(
-                        "You have already used a trial. Please wait before requesting another.\n\n"
-                        "🎁 For more chances, you can join our giveaway channel:\n"
-                        f"{GIVEAWAY_CHANNEL_URL}\n\n"
-                        f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
-                    ),
-                )
-                try:
-                    await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                    await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                except Exception:
-                    pass
-                return
-            
-            # Check when trial ended
-            trial_ended_at_str = user_trial_info.get("trial_ended_at") or user_trial_info.get("left_early_at")
-            if trial_ended_at_str:
-                try:
-                    ended_at = _parse_iso_to_utc(trial_ended_at_str)
-                    days_since_end = (now - ended_at).total_seconds() / 86400
-                    
-                    if days_since_end < TRIAL_COOLDOWN_DAYS:  # Cooldown period
-                        await context.bot.send_message(
-                            chat_id=user.id,
-                            text=(
-                                f"You recently used a trial. Please wait {TRIAL_COOLDOWN_DAYS} days before requesting another.\n\n"
-                                "🎁 For more chances, you can join our giveaway channel:\n"
-                                f"{GIVEAWAY_CHANNEL_URL}\n\n"
-                                f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
-                            ),
-                        )
-                        # Remove from channel
-                        try:
-                            await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                            await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                        except Exception:
-                            pass
-                        return
-                except Exception:
-                    # If we can't parse the date, block to be safe
-                    await context.bot.send_message(
-                        chat_id=user.id,
-                        text=(
-                            "You have already used a trial. Please wait before requesting another.\n\n"
-                            "🎁 For more chances, you can join our giveaway channel:\n"
-                            f"{GIVEAWAY_CHANNEL_URL}\n\n"
-                            f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
-                        ),
-                    )
-                    try:
-                        await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                        await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                    except Exception:
-                        pass
-                    return
-            else:
-                # No end date recorded but they used a trial - block to be safe
-                await context.bot.send_message(
-                    chat_id=user.id,
-                    text=(
-                        "You have already used a trial. Please wait before requesting another.\n\n"
-                        "🎁 For more chances, you can join our giveaway channel:\n"
-                        f"{GIVEAWAY_CHANNEL_URL}\n\n"
-                        f"💬 Or DM {SUPPORT_CONTACT} to upgrade to the premium signals."
-                    ),
-                )
-                try:
-                    await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                    await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user.id)
-                except Exception:
-                    pass
-                return
+        cooldown = _trial_cooldown_remaining(user.id, now)
+        if cooldown is not None:
+            await _reject_used_trial(context.bot, user.id, _COOLDOWN_MSG if cooldown else _REJECT_USED_TRIAL_MSG)
+            return
         
-        # Determine trial duration based on weekend
-        if _is_weekend(now):
-            trial_days = 5
-            total_hours = TRIAL_HOURS_5_DAY
-        else:
-            trial_days = 3
-            total_hours = TRIAL_HOURS_3_DAY
-
         # If an active trial already exists and has not yet expired, avoid double-scheduling
         existing = get_active_trial(user.id)
         if existing:
             # Validate trial data hasn't been tampered with
             if not validate_trial_data(existing, user.id):
-                logger.warning(f"Invalid trial data for user {user.id}, clearing and restarting")
+                logger.warning("Invalid trial data for user %s, clearing and restarting", user.id)
                 clear_active_trial(user.id)
-            elif "trial_end_at" in existing:
-                try:
-                    end_at = _parse_iso_to_utc(existing["trial_end_at"])
-                    if now < end_at:
-                        # Trial is already running; do not re-start it
-                        return
-                except Exception:
-                    pass
-
-        trial_end_at = now + timedelta(hours=total_hours)
-
-        # Track active trial so we can compute remaining hours if user leaves early and restore after restart
-        set_active_trial(
-            user.id,
-            {
-                "join_time": now.isoformat(),
-                "total_hours": total_hours,
-                "trial_end_at": trial_end_at.isoformat(),
-            },
-        )
-
-        append_trial_log(
-            {
-                "tg_id": user.id,
-                "username": user.username,
-                "join_time": now.isoformat(),
-                "trial_days": trial_days,
-            }
-        )
-
-        await context.bot.send_message(
-            chat_id=user.id,
-            text=(
-                f"✅ Your {trial_days}-day ({total_hours} hours) trial phase has started now!\n\n"
-                "You will receive reminders as your trial approaches the end."
-            ),
-        )
-
-        jq = context.job_queue
-        logger.info(f"Scheduling reminder jobs for user {user.id} ({trial_days}-day trial)")
+                _cancel_trial_jobs(context.job_queue, user.id)
+            else:
+                end_ts = _trial_end_ts(existing)
+                if end_ts is not None and now.timestamp() < end_ts:
+                    # Trial is already running; do not re-start it
+                    return
 
-        if trial_days == 3:
-            # Use configurable reminder times (in minutes)
-            jq.run_once(
-                trial_reminder_3day_1,
-                when=timedelta(minutes=REMINDER_1_MINUTES),
-                data={"user_id": user.id},
-                name=f"reminder_1_{user.id}",
-            )
-            jq.run_once(
-                trial_reminder_3day_2,
-                when=timedelta(minutes=REMINDER_2_MINUTES),
-                data={"user_id": user.id},
-                name=f"reminder_2_{user.id}",
-            )
-            jq.run_once(
-                trial_end,
-                when=timedelta(minutes=TRIAL_END_3DAY_MINUTES),
-                data={"user_id": user.id},
-                name=f"trial_end_{user.id}",
-            )
-            logger.info(f"Scheduled 3-day trial jobs for user {user.id}: reminder_1 at {REMINDER_1_MINUTES}min, reminder_2 at {REMINDER_2_MINUTES}min, end at {TRIAL_END_3DAY_MINUTES}min")
-        else:
-            # Use configurable reminder times (in minutes)
-            jq.run_once(
-                trial_reminder_5day_1,
-                when=timedelta(minutes=REMINDER_1_MINUTES),
-                data={"user_id": user.id},
-                name=f"reminder_1_{user.id}",
-            )
-            jq.run_once(
-                trial_reminder_5day_3,
-                when=timedelta(minutes=REMINDER_3_MINUTES),
-                data={"user_id": user.id},
-                name=f"reminder_3_{user.id}",
-            )
-            jq.run_once(
-                trial_reminder_5day_4,
-                when=timedelta(minutes=REMINDER_4_MINUTES),
-                data={"user_id": user.id},
-                name=f"reminder_4_{user.id}",
-            )
-            jq.run_once(
-                trial_end,
-                when=timedelta(minutes=TRIAL_END_5DAY_MINUTES),
-                data={"user_id": user.id},
-                name=f"trial_end_{user.id}",
-            )
-            logger.info(f"Scheduled 5-day trial jobs for user {user.id}: reminder_1 at {REMINDER_1_MINUTES}min, reminder_3 at {REMINDER_3_MINUTES}min, reminder_4 at {REMINDER_4_MINUTES}min, end at {TRIAL_END_5DAY_MINUTES}min")
+        await start_trial_session(user, context, now)
 
     # Detect user leaving during trial phase and send feedback form
-    if old.status in ("member", "administrator") and new.status in ("left", "kicked"):
-        logger.info(f"=== USER LEAVE DETECTED ===")
-        logger.info(f"User left/kicked: old_status={old.status}, new_status={new.status}")
+    if old.status in _INSIDE_STATUSES and new.status in _OUTSIDE_STATUSES:
+        logger.info("=== USER LEAVE DETECTED ===")
+        logger.info("User left/kicked: old_status=%s, new_status=%s", old.status, new.status)
         
         user = old.user
         if not user:
             logger.warning("old.user is None in trial_chat_member_update (leave)")
             return
         
-        logger.info(f"Leave event for user_id={user.id}, username={user.username}")
-        logger.info(f"chat_member.from_user: {chat_member.from_user.id if chat_member.from_user else 'None'}")
+        logger.info("Leave event for user_id=%s, username=%s", user.id, user.username)
+        logger.info("chat_member.from_user: %s", chat_member.from_user.id if chat_member.from_user else 'None')
         
-        # Ignore leaves caused by the bot itself (e.g. scheduled trial_end ban/unban)
-        try:
-            bot_user = await context.bot.get_me()
-            logger.debug(f"Bot user id: {bot_user.id if bot_user else 'None'}")
-        except Exception as e:
-            logger.warning(f"Failed to get bot user info: {e}")
-            bot_user = None
-
-        # If the actor is the bot, don't send feedback (this is likely trial_end cleanup)
-        if bot_user and chat_member.from_user and chat_member.from_user.id == bot_user.id:
+        # Ignore leaves caused by the bot itself (e.g. scheduled trial_end ban/unban);
+        # in that case don't send feedback (this is likely trial_end cleanup)
+        if _BOT_ID and chat_member.from_user and chat_member.from_user.id == _BOT_ID:
             logger.info("Leave was caused by bot itself (trial_end cleanup), skipping feedback message")
             return
         
-        logger.info(f"Processing voluntary leave for user_id={user.id}")
+        logger.info("Processing voluntary leave for user_id=%s", user.id)
 
         # Get trial data BEFORE clearing it
         active = get_active_trial(user.id)
-        logger.info(f"Active trial data for user {user.id}: {active}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Active trial data for user %s: %s", user.id, active)
         
         # Try to compute how many trial hours they used and how many were remaining
         usage_info = ""
@@ -1252,35 +1596,31 @@ async def trial_chat_member_update(update: Update, context: ContextTypes.DEFAULT
         total_hours_used = 0
         try:
             if active and "join_time" in active and "total_hours" in active:
-                join_time = _parse_iso_to_utc(active["join_time"])
+                join_ts = _parse_iso_to_utc(active["join_time"]).timestamp()
                 total_hours = float(active["total_hours"])
                 total_days = int(total_hours / 24)
-                now = _now_utc()
-                elapsed_hours = (now - join_time).total_seconds() / 3600.0
+                now_ts = now.timestamp()
+                elapsed_hours = (now_ts - join_ts) / 3600.0
                 remaining_hours = max(0.0, total_hours - elapsed_hours)
                 total_hours_used = total_hours
 
-                # Round for nicer display
-                elapsed_hours_rounded = round(elapsed_hours, 1)
-                remaining_hours_rounded = round(remaining_hours, 1)
-
                 usage_info = (
                     f"\n\n📊 Trial Usage Summary:\n"
-                    f"• You consumed: {elapsed_hours_rounded} hours out of {int(total_hours)} hours ({total_days} days)\n"
-                    f"• Remaining unused: {remaining_hours_rounded} hours"
+                    f"• You consumed: {elapsed_hours:.1f} hours out of {int(total_hours)} hours ({total_days} days)\n"
+                    f"• Remaining unused: {remaining_hours:.1f} hours"
                 )
-                logger.info(f"User {user.id} consumed {elapsed_hours_rounded}/{total_hours} hours, {remaining_hours_rounded} remaining")
+                logger.info("User %s consumed %.1f/%s hours, %.1f remaining", user.id, elapsed_hours, total_hours, remaining_hours)
             else:
-                logger.warning(f"No active trial found for user {user.id} (may have already been cleared or never started)")
+                logger.warning("No active trial found for user %s (may have already been cleared or never started)", user.id)
                 usage_info = "\n\nYour trial data was not found - it may have already expired."
         except Exception as e:
-            logger.error(f"Failed to compute remaining trial hours for user_id={user.id}: {e}", exc_info=True)
+            logger.error("Failed to compute remaining trial hours for user_id=%s: %s", user.id, e, exc_info=True)
             usage_info = ""
 
         # FIRST: Mark trial as used BEFORE clearing active trial (important order!)
         try:
             leave_info = {
-                "left_early_at": _now_utc().isoformat(),
+                "left_early_at": now.isoformat(),
                 "reason": "user_left_channel"
             }
             if active:
@@ -1288,38 +1628,43 @@ async def trial_chat_member_update(update: Update, context: ContextTypes.DEFAULT
                 leave_info["total_hours"] = active.get("total_hours")
             
             mark_trial_used(user.id, leave_info)
-            logger.info(f"✅ Successfully marked trial as used for user {user.id} (left early)")
+            logger.info("✅ Successfully marked trial as used for user %s (left early)", user.id)
         except Exception as e:
-            logger.error(f"❌ FAILED to mark trial used on early leave for user_id={user.id}: {e}", exc_info=True)
+            logger.error("❌ FAILED to mark trial used on early leave for user_id=%s: %s", user.id, e, exc_info=True)
 
         # SECOND: Clear active trial tracking since they left
         try:
             clear_active_trial(user.id)
-            logger.info(f"Cleared active trial for user {user.id}")
+            logger.info("Cleared active trial for user %s", user.id)
         except Exception as e:
-            logger.warning(f"Failed to clear active trial for user_id={user.id}: {e}", exc_info=True)
+            logger.warning("Failed to clear active trial for user_id=%s: %s", user.id, e, exc_info=True)
+        # Their reminders and trial_end no longer apply
+        _cancel_trial_jobs(context.job_queue, user.id)
 
         # THIRD: Send message to user about leaving
         try:
-            leave_message = (
-                f"👋 You have left the trial channel.\n"
-                f"{usage_info}\n\n"
-                f"Your free {total_days}-day trial has been marked as consumed.\n\n"
-                "We hope you enjoyed testing our signals! 🙌\n\n"
-                f"📝 We'd love to hear your feedback:\n{FEEDBACK_FORM_URL}\n\n"
-                f"🎁 For more chances, join our giveaway: {GIVEAWAY_CHANNEL_URL}\n"
-                f"💬 Ready to upgrade? DM {SUPPORT_CONTACT}"
+            leave_message = _LEAVE_MSG_TMPL.format_map(
+                {"usage_info": usage_info, "total_days": total_days}
             )
             
             await context.bot.send_message(
                 chat_id=user.id,
                 text=leave_message,
             )
-            logger.info(f"✅ Successfully sent leave message to user {user.id}")
+            logger.info("✅ Successfully sent leave message to user %s", user.id)
         except Exception as e:
-            logger.error(f"❌ Failed to send leave message to user_id={user.id}: {e}", exc_info=True)
+            logger.error("❌ Failed to send leave message to user_id=%s: %s", user.id, e, exc_info=True)
         
-        logger.info(f"=== LEAVE PROCESSING COMPLETE for user {user.id} ===")
+        logger.info("=== LEAVE PROCESSING COMPLETE for user %s ===", user.id)
+
+
+def _trial_already_ended(active_trial: Dict[str, Any]) -> bool:
+    """
+    Return True if the stored trial end time has passed.
+    Missing or unparseable data is treated as still running.
+    """
+    end_ts = _trial_end_ts(active_trial)
+    return end_ts is not None and _now_utc().timestamp() >= end_ts
 
 
 async def _send_trial_reminder(context: ContextTypes.DEFAULT_TYPE, user_id: int, message: str, reminder_name: str = "reminder") -> bool:
@@ -1327,114 +1672,87 @@ async def _send_trial_reminder(context: ContextTypes.DEFAULT_TYPE, user_id: int,
     Helper function to send trial reminders with proper error handling.
     Returns True if message was sent successfully, False otherwise.
     """
-    logger.info(f"=== {reminder_name} triggered for user {user_id} ===")
+    logger.info("=== %s triggered for user %s ===", reminder_name, user_id)
     
-    # Check if user still has an active trial before sending reminder
+    # Cheap expiry check against the end time captured when the job was scheduled
+    scheduled_end_ts = context.job.data.trial_end_ts if context.job else None
+    if scheduled_end_ts is not None and _now_utc().timestamp() >= scheduled_end_ts:
+        logger.info("Skipping %s for user %s - trial already expired (scheduled end)", reminder_name, user_id)
+        return False
+    
+    # Jobs are cancelled when a trial ends or the user leaves; this in-memory
+    # lookup is only a sanity check for anything that slipped through
     active_trial = get_active_trial(user_id)
     if not active_trial:
-        logger.info(f"Skipping {reminder_name} for user {user_id} - no active trial (user may have left early)")
+        logger.info("Skipping %s for user %s - no active trial (user may have left early)", reminder_name, user_id)
         return False
     
-    logger.debug(f"Active trial data for {reminder_name}: {active_trial}")
-    
     # Verify trial hasn't expired yet
-    try:
-        trial_end_str = active_trial.get("trial_end_at")
-        if trial_end_str:
-            trial_end_at = _parse_iso_to_utc(trial_end_str)
-            now = _now_utc()
-            if now >= trial_end_at:
-                logger.info(f"Skipping {reminder_name} for user {user_id} - trial already expired at {trial_end_at}")
-                return False
-            else:
-                remaining = (trial_end_at - now).total_seconds() / 3600
-                logger.debug(f"Trial still active, {round(remaining, 1)} hours remaining")
-    except Exception as e:
-        logger.warning(f"Error checking trial expiry for user {user_id}: {e}")
+    if _trial_already_ended(active_trial):
+        logger.info("Skipping %s for user %s - trial already expired at %s", reminder_name, user_id, active_trial.get('trial_end_at', active_trial.get('trial_end_ts')))
+        return False
     
     try:
         await context.bot.send_message(chat_id=user_id, text=message)
-        logger.info(f"✅ Successfully sent {reminder_name} to user {user_id}")
-        return True
     except Exception as e:
-        logger.error(f"❌ Failed to send {reminder_name} to user {user_id}: {e}", exc_info=True)
+        logger.error("❌ Failed to send %s to user %s: %s", reminder_name, user_id, e, exc_info=True)
         return False
+    logger.info("✅ Successfully sent %s to user %s", reminder_name, user_id)
+    return True
 
 
 async def trial_reminder_3day_1(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
-    logger.info(f"trial_reminder_3day_1 job executing for user {user_id}")
+    user_id = context.job.data.user_id
+    logger.info("trial_reminder_3day_1 job executing for user %s", user_id)
     await _send_trial_reminder(
         context, user_id,
-        "Hey, it's Freya 💋\n\n"
-        "You've been inside my 3-Day Trial for about a day now – I hope you've already seen how I structure my trades and risk.\n\n"
-        "In this group you'll usually see:\n\n"
-        "• 🔔 2–6 signals per day\n"
-        "• 🎯 Clear entry, take-profit levels & stop-loss\n"
-        "• 📊 Screenshots + short explanation so you can learn, not just copy\n\n"
-        "If you missed anything, scroll up in the trial chat and check today's setups – everything is transparent, including wins and SL.\n\n"
-        f"If you have any questions, you can always DM me here: {SUPPORT_CONTACT}\n\n"
-        "Stay tuned, more setups are coming. 💸",
+        _REMINDER_3DAY_1_TEXT,
         reminder_name="24h_reminder_3day"
     )
 
 
 async def trial_reminder_3day_2(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
-    logger.info(f"trial_reminder_3day_2 job executing for user {user_id}")
+    user_id = context.job.data.user_id
+    logger.info("trial_reminder_3day_2 job executing for user %s", user_id)
     await _send_trial_reminder(
         context, user_id,
-        "Day 2 check-in 🧡\n\n"
-        "You're almost two days into the trial now. You've probably noticed:\n\n"
-        "• How I wait for clean setups, not random entries\n"
-        "• How every trade comes with a fixed SL (no \"no-SL gambling\")\n"
-        "• How I manage multiple take-profits to lock in profit\n\n"
-        "If this style fits you and you want daily guidance, my members stay with me on a 30-Day Premium plan where they get:\n\n"
-        "• Full-access signals (all pairs / gold / indices I trade)\n"
-        "• Priority support in DM\n"
-        "• Occasional market breakdowns & extra tips\n\n"
-        "I'll send you a small reminder again when your trial is about to end, so you don't miss the chance to continue.\n\n"
-        f"For now – just keep watching the signals and see if it matches your personality and schedule. ❤️\n\n"
-        f"If you already know you want to stay, message me 'PREMIUM' here: {SUPPORT_CONTACT}",
+        _REMINDER_3DAY_2_TEXT,
         reminder_name="48h_reminder_3day"
     )
 
 
 async def trial_reminder_5day_1(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
-    logger.info(f"trial_reminder_5day_1 job executing for user {user_id}")
+    user_id = context.job.data.user_id
+    logger.info("trial_reminder_5day_1 job executing for user %s", user_id)
     await _send_trial_reminder(
         context, user_id,
-        "⏱ 1 day (24 hours) has passed, 4 days remaining in your 5-day trial.\n\n"
-        f"💬 Enjoying the signals? Upgrade anytime by contacting {SUPPORT_CONTACT}",
+        _REMINDER_5DAY_1_TEXT,
         reminder_name="24h_reminder_5day"
     )
 
 
 async def trial_reminder_5day_3(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
-    logger.info(f"trial_reminder_5day_3 job executing for user {user_id}")
+    user_id = context.job.data.user_id
+    logger.info("trial_reminder_5day_3 job executing for user %s", user_id)
     await _send_trial_reminder(
         context, user_id,
-        "⏱ 3 days (72 hours) have passed, 2 days remaining in your 5-day trial.\n\n"
-        f"💬 Questions about upgrading? Contact {SUPPORT_CONTACT}",
+        _REMINDER_5DAY_3_TEXT,
         reminder_name="72h_reminder_5day"
     )
 
 
 async def trial_reminder_5day_4(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
-    logger.info(f"trial_reminder_5day_4 job executing for user {user_id}")
+    user_id = context.job.data.user_id
+    logger.info("trial_reminder_5day_4 job executing for user %s", user_id)
     await _send_trial_reminder(
         context, user_id,
-        "⏱ 4 days (96 hours) have passed. Only the last 24 hours left in your trial!\n\n"
-        f"⚡ Don't miss out! Contact {SUPPORT_CONTACT} to upgrade and keep receiving signals.",
+        _REMINDER_5DAY_4_TEXT,
         reminder_name="96h_reminder_5day"
     )
 
 
 async def trial_end(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.data["user_id"]
+    user_id = context.job.data.user_id
     logger.info(f"=== trial_end job executing for user {user_id} ===")
     
     # Check if user still has active trial (they might have left early)
@@ -1443,184 +1761,260 @@ async def trial_end(context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.info(f"No active trial for user {user_id} - they may have left early, skipping trial_end")
         return
     
-    # Check if already marked as used (avoid duplicate marking)
-    if has_used_trial(user_id):
-        logger.info(f"User {user_id} already marked as used trial, clearing active trial only")
-        clear_active_trial(user_id)
-        return
-    
-    # Mark this user as having used their free trial first (JSON is the source of truth)
+    # Mark this user as having used their free trial and clear the active trial
+    # in one storage step (JSON is the source of truth)
     try:
-        mark_trial_used(
+        newly_marked = finalize_trial(
             user_id,
             {
                 "trial_ended_at": _now_utc().isoformat(),
                 "ended_by": "scheduled_job"
             },
         )
-        logger.info(f"✅ Marked trial as used for user {user_id}")
     except Exception as e:
-        logger.error(f"❌ Failed to mark trial as used for user_id={user_id}: {e}", exc_info=True)
-
-    # Clear active trial tracking on natural trial end
-    try:
-        clear_active_trial(user_id)
-        logger.info(f"Cleared active trial for user {user_id}")
-    except Exception as e:
-        logger.error(f"Failed to clear active trial for user {user_id}: {e}")
+        logger.error(f"❌ Failed to finalize trial for user_id={user_id}: {e}", exc_info=True)
+    else:
+        if not newly_marked:
+            # Already marked as used elsewhere (avoid duplicate marking/notifying)
+            logger.info(f"User {user_id} already marked as used trial, cleared active trial only")
+            return
+        logger.info(f"✅ Marked trial as used and cleared active trial for user {user_id}")
+    _cancel_trial_jobs(context.job_queue, user_id, _REMINDER_JOB_PREFIXES)
 
-    # Notify user and remove them from trial channel
-    try:
-        await context.bot.send_message(
+    # Notify user and remove them from trial channel concurrently
+    send_result, kick_result = await asyncio.gather(
+        context.bot.send_message(
             chat_id=user_id,
-            text=(
-                "Your trial just ended 🕊\n\n"
-                "Thank you for testing Freya's Flirty Profits for 3 days.\n\n"
-                "If you liked the structure of the signals and want to keep going, here are your options:\n\n"
-                "✅ 30-Day Premium Membership\n"
-                "– Full access to all signals\n"
-                "– Same entries I personally take\n"
-                "– Ongoing DM support for questions\n\n"
-                f"Message me directly: {SUPPORT_CONTACT}\n\n"
-                "If you're not ready yet, no pressure – you can also stay connected through my public channel for updates and occasional previews:\n\n"
-                f"🌐 Public channel: {GIVEAWAY_CHANNEL_URL}\n\n"
-                "Trade safe, manage your risk, and remember: no one wins every trade – the edge comes from discipline. 💚"
-            ),
-        )
+            text=_TRIAL_END_TEXT,
+        ),
+        _kick_from_trial_channel(context.bot, user_id),
+        return_exceptions=True,
+    )
+    if isinstance(send_result, Exception):
+        logger.warning(f"Could not send trial end message to user {user_id}: {send_result}")
+    else:
         logger.info(f"✅ Sent trial end message to user {user_id}")
-    except Exception as e:
-        logger.warning(f"Could not send trial end message to user {user_id}: {e}")
 
-    # Remove from trial channel
-    try:
-        await context.bot.ban_chat_member(TRIAL_CHANNEL_ID, user_id)
-        await context.bot.unban_chat_member(TRIAL_CHANNEL_ID, user_id)
+    if isinstance(kick_result, Exception):
+        logger.warning(f"Could not remove user {user_id} from trial channel: {kick_result}")
+    else:
         logger.info(f"Removed user {user_id} from trial channel")
-    except Exception as e:
-        logger.warning(f"Could not remove user {user_id} from trial channel: {e}")
     
     logger.info(f"=== trial_end complete for user {user_id} ===")
 
 
-def main() -> None:
+# Per-user trial jobs: (job name prefix, seconds after join, job callback).
+# Used both when a user joins and when restoring jobs after a restart.
+_SCHEDULE_3DAY = (
+    ("reminder_1", REMINDER_1_MINUTES * 60.0, trial_reminder_3day_1),
+    ("reminder_2", REMINDER_2_MINUTES * 60.0, trial_reminder_3day_2),
+    ("trial_end", TRIAL_END_3DAY_MINUTES * 60.0, trial_end),
+)
+_SCHEDULE_5DAY = (
+    ("reminder_1", REMINDER_1_MINUTES * 60.0, trial_reminder_5day_1),
+    ("reminder_3", REMINDER_3_MINUTES * 60.0, trial_reminder_5day_3),
+    ("reminder_4", REMINDER_4_MINUTES * 60.0, trial_reminder_5day_4),
+    ("trial_end", TRIAL_END_5DAY_MINUTES * 60.0, trial_end),
+)
+_SCHEDULES = {
+    _TRIAL_HOURS_3_DAY_I: _SCHEDULE_3DAY,
+    _TRIAL_HOURS_5_DAY_I: _SCHEDULE_5DAY,
+}
+
+
+def _schedule_trial_jobs(jq, user_id: int, trial_days: int, trial_end_ts: float) -> None:
     """
-    Synchronous entrypoint for running the bot.
-    Handlers remain async, but python-telegram-bot v21+ can manage the event
-    loop internally via `run_polling()`.
+    Register the reminder and trial_end jobs for a freshly started trial.
+    The scheduler is paused while the jobs are added so it recomputes its
+    next wakeup once on resume instead of after every run_once.
     """
-    # BOT_TOKEN is already validated at module level
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+    jobs = _SCHEDULE_5DAY if trial_days == 5 else _SCHEDULE_3DAY
+    job_data = TrialJobData(user_id, trial_end_ts)
+    jq.scheduler.pause()
+    try:
+        for name, offset_s, callback in jobs:
+            # run_once accepts a float delay in seconds directly
+            jq.run_once(
+                callback,
+                when=offset_s,
+                data=job_data,
+                name=f"{name}_{user_id}",
+            )
+    finally:
+        jq.scheduler.resume()
     
-    # IMPORTANT: For ChatMemberHandler to work, ensure:
-    # 1. Bot is an admin in the trial channel/group
-    # 2. Bot has necessary permissions (at minimum: view members)
-    # 3. Bot is not in "Group Privacy" mode (BotFather -> Bot Settings -> Group Privacy -> OFF)
-    #    OR the bot must be added as admin to receive member updates
-    logger.info("Application built. ChatMemberHandler requires bot to be admin in trial channel.")
+    if trial_days == 5:
+        logger.info("Scheduled 5-day trial jobs for user %s: reminder_1 at %smin, reminder_3 at %smin, reminder_4 at %smin, end at %smin", user_id, REMINDER_1_MINUTES, REMINDER_3_MINUTES, REMINDER_4_MINUTES, TRIAL_END_5DAY_MINUTES)
+    else:
+        logger.info("Scheduled 3-day trial jobs for user %s: reminder_1 at %smin, reminder_2 at %smin, end at %smin", user_id, REMINDER_1_MINUTES, REMINDER_2_MINUTES, TRIAL_END_3DAY_MINUTES)
 
-    # Restore trial end jobs and reminder jobs after a restart based on active_trials.json
-    try:
-        now = _now_utc()
-        active_trials = get_all_active_trials()
-        jq = application.job_queue
-        
-        logger.info(f"=== RESTORING JOBS ON STARTUP ===")
-        logger.info(f"Found {len(active_trials)} active trials to restore")
 
-        for tg_id_str, info in active_trials.items():
-            try:
-                user_id = int(tg_id_str)
-            except ValueError:
-                continue
+# Name prefixes of every per-user trial job (same names at join time and on restore)
+_REMINDER_JOB_PREFIXES = ("reminder_1", "reminder_2", "reminder_3", "reminder_4")
+_TRIAL_JOB_PREFIXES = _REMINDER_JOB_PREFIXES + ("trial_end",)
 
-            # Validate trial data hasn't been tampered with
-            if not validate_trial_data(info, user_id):
-                logger.warning(f"Invalid trial data for user {user_id} on restore, clearing")
-                clear_active_trial(user_id)
-                continue
 
-            trial_end_at_str = info.get("trial_end_at")
-            join_time_str = info.get("join_time")
-            total_hours = info.get("total_hours")
+def _cancel_trial_jobs(jq, user_id: int, prefixes: tuple = _TRIAL_JOB_PREFIXES) -> None:
+    """Remove a user's pending trial jobs once their trial is over."""
+    if jq is None:
+        return
+    for prefix in prefixes:
+        for job in jq.get_jobs_by_name(f"{prefix}_{user_id}"):
+            job.schedule_removal()
+
+
+async def _cache_bot_id(application: Application) -> None:
+    """Fetch the bot's own user id once so handlers don't call get_me() per event."""
+    global _BOT_ID
+    _BOT_ID = (await application.bot.get_me()).id
+    logger.info(f"Cached bot id: {_BOT_ID}")
+
+
+def _restore_trial_jobs(jq) -> None:
+    """
+    Re-create reminder and trial_end jobs after a restart from active_trials.json.
+    Per-job details are logged at DEBUG only; one summary line is logged at INFO
+    so restoring thousands of trials isn't dominated by log formatting.
+    """
+    now_ts = _now_utc().timestamp()
+    active_trials = get_all_active_trials_typed()
+
+    logger.info(f"=== RESTORING JOBS ON STARTUP ===")
+    logger.info(f"Found {len(active_trials)} active trials to restore")
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    restored_jobs = 0
+    expired_users = 0
 
-            if not join_time_str or total_hours is None:
+    for user_id, info in active_trials.items():
+        # Validate trial data hasn't been tampered with
+        if not validate_trial_data(info, user_id):
+            logger.warning(f"Invalid trial data for user {user_id} on restore, clearing")
+            clear_active_trial(user_id)
+            continue
+
+        join_time_str = info.get("join_time")
+        total_hours = info.get("total_hours")
+
+        if not join_time_str or total_hours is None:
+            continue
+
+        try:
+            join_ts = _parse_iso_to_utc(join_time_str).timestamp()
+            total_hours_float = float(total_hours)
+
+            # Calculate end time
+            end_ts = _trial_end_ts(info)
+            if end_ts is None:
+                end_ts = join_ts + total_hours_float * 3600.0
+
+            # Pick the reminder schedule for this trial type (3-day or 5-day)
+            schedule = _SCHEDULES.get(int(round(total_hours_float)))
+            if schedule is None:
+                logger.warning(f"Unknown trial length {total_hours_float}h for user {user_id}, skipping restore")
                 continue
 
-            try:
-                join_dt = _parse_iso_to_utc(join_time_str)
-                total_hours_float = float(total_hours)
-                
-                # Calculate end time
-                if trial_end_at_str:
-                    end_dt = _parse_iso_to_utc(trial_end_at_str)
-                else:
-                    end_dt = join_dt + timedelta(hours=total_hours_float)
-                
-                # Determine trial type (3-day or 5-day) based on total_hours
-                is_5day = (total_hours_float == TRIAL_HOURS_5_DAY)
-                
-                # Restore reminder jobs based on trial type (use configurable minutes)
-                if is_5day:
-                    # 5-day trial: reminders at configured times
-                    reminder_times_minutes = [
-                        (REMINDER_1_MINUTES, trial_reminder_5day_1),
-                        (REMINDER_3_MINUTES, trial_reminder_5day_3),
-                        (REMINDER_4_MINUTES, trial_reminder_5day_4),
-                        (TRIAL_END_5DAY_MINUTES, trial_end),
-                    ]
-                else:
-                    # 3-day trial: reminders at configured times
-                    reminder_times_minutes = [
-                        (REMINDER_1_MINUTES, trial_reminder_3day_1),
-                        (REMINDER_2_MINUTES, trial_reminder_3day_2),
-                        (TRIAL_END_3DAY_MINUTES, trial_end),
-                    ]
-                
-                # Schedule each reminder job if it hasn't passed yet
-                restored_jobs = 0
-                for minutes_offset, job_func in reminder_times_minutes:
-                    reminder_time = join_dt + timedelta(minutes=minutes_offset)
-                    delay = reminder_time - now
-                    
-                    # Only schedule if the reminder time hasn't passed yet
-                    if delay.total_seconds() > 0:
-                        jq.run_once(
-                            job_func,
-                            when=delay,
-                            data={"user_id": user_id},
-                            name=f"{job_func.__name__}_{user_id}",
-                        )
-                        logger.info(f"Restored {job_func.__name__} for user {user_id}, scheduled in {delay}")
-                        restored_jobs += 1
-                    else:
-                        logger.debug(f"Skipped {job_func.__name__} for user {user_id} (already passed)")
-                
-                if restored_jobs > 0:
-                    logger.info(f"Restored {restored_jobs} jobs for user {user_id}")
-                
-                # If trial end has passed, schedule immediate cleanup
-                if end_dt <= now:
+            # Schedule each reminder job if it hasn't passed yet
+            job_data = TrialJobData(user_id, end_ts)
+            for job_name, offset_s, job_func in schedule:
+                # run_once accepts a float delay in seconds directly
+                delay_s = join_ts + offset_s - now_ts
+
+                # Only schedule if the reminder time hasn't passed yet
+                if delay_s > 0:
                     jq.run_once(
-                        trial_end,
-                        when=timedelta(seconds=0),
-                        data={"user_id": user_id},
+                        job_func,
+                        when=delay_s,
+                        data=job_data,
+                        name=f"{job_name}_{user_id}",
                     )
-                    logger.info(f"Scheduled immediate trial_end cleanup for user {user_id} (trial expired)")
-                    
-            except Exception as e:
-                logger.warning(f"Error restoring jobs for user {user_id}: {e}", exc_info=True)
-                continue
-                
-        logger.info(f"=== JOB RESTORATION COMPLETE ===")
+                    restored_jobs += 1
+                    if debug_enabled:
+                        logger.debug(f"Restored {job_name} for user {user_id}, scheduled in {delay_s:.0f}s")
+                elif debug_enabled:
+                    logger.debug(f"Skipped {job_name} for user {user_id} (already passed)")
+
+            # If trial end has passed, schedule immediate cleanup
+            if end_ts <= now_ts:
+                jq.run_once(
+                    trial_end,
+                    when=0,
+                    data=job_data,
+                    name=f"trial_end_{user_id}",
+                )
+                expired_users += 1
+                logger.info(f"Scheduled immediate trial_end cleanup for user {user_id} (trial expired)")
+
+        except Exception as e:
+            logger.warning(f"Error restoring jobs for user {user_id}: {e}", exc_info=True)
+            continue
+
+    logger.info(f"=== JOB RESTORATION COMPLETE: {restored_jobs} jobs restored, {expired_users} expired trial(s) queued for cleanup ===")
+
+
+async def _post_init(application: Application) -> None:
+    """Startup hook: cache the bot id, start the trial log writer and open the shared HTTP session."""
+    await _cache_bot_id(application)
+    _TRIAL_LOG.start()
+    # Users who were mid phone verification before the restart
+    _IN_PHONE_VERIF.update(get_phone_stage_user_ids())
+    # Restore trial jobs here rather than in main() so startup shares one async
+    # entry point with the other init work; jobs run once the queue starts
+    try:
+        _restore_trial_jobs(application.job_queue)
     except Exception as e:
         logger.warning(f"Failed to restore active trial jobs: {e}", exc_info=True)
+    # One pooled session for web app API calls, so each "Continue verification"
+    # tap reuses a keep-alive connection instead of a fresh TCP/TLS handshake
+    application.bot_data["http"] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60),
+        timeout=_WEB_API_TIMEOUT,
+    )
+
+
+async def _post_shutdown(application: Application) -> None:
+    """Shutdown hook: close the shared HTTP session and flush buffered storage."""
+    try:
+        await _TRIAL_LOG.stop()
+        session = application.bot_data.pop("http", None)
+        if session is not None:
+            await session.close()
+    finally:
+        # Active-trial updates are write-back buffered in storage; PTB's signal-driven
+        # shutdown doesn't reliably reach atexit, so flush explicitly here
+        flush_pending_writes()
+
+
+def main() -> None:
+    """
+    Synchronous entrypoint for running the bot.
+    Handlers remain async, but python-telegram-bot v21+ can manage the event
+    loop internally via `run_polling()`.
+    """
+    # BOT_TOKEN is already validated at module level
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        # Keep bursts (mass reminders / cleanup) under Telegram's ~30 msg/s limit
+        # and retry 429s with the server-provided delay instead of failing
+        .rate_limiter(AIORateLimiter(overall_max_rate=30, overall_time_period=1, max_retries=3))
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
     
-    # Add periodic cleanup job as fallback (runs every hour)
+    # IMPORTANT: For ChatMemberHandler to work, ensure:
+    # 1. Bot is an admin in the trial channel/group
+    # 2. Bot has necessary permissions (at minimum: view members)
+    # 3. Bot is not in "Group Privacy" mode (BotFather -> Bot Settings -> Group Privacy -> OFF)
+    #    OR the bot must be added as admin to receive member updates
+    logger.info("Application built. ChatMemberHandler requires bot to be admin in trial channel.")
+
+    # Add periodic cleanup job as fallback (runs every CLEANUP_INTERVAL_HOURS)
     # This ensures trials end even if scheduled jobs fail
     try:
         application.job_queue.run_repeating(
             periodic_trial_cleanup,
-            interval=timedelta(hours=1),  # Check every hour
+            interval=timedelta(hours=CLEANUP_INTERVAL_HOURS),  # Safety-net sweep
             first=timedelta(minutes=5)  # Start 5 minutes after bot starts
         )
         logger.info("Periodic trial cleanup job scheduled")
@@ -1646,7 +2040,7 @@ def main() -> None:
 
     # Handle "No thanks" / deny button for phone verification
     application.add_handler(
-        MessageHandler(filters.Regex(r"^❌ No thanks$"), phone_deny_handler)
+        MessageHandler(filters.Text([_PHONE_DENY_TEXT]), phone_deny_handler)
     )
 
     # Handle text messages during phone verification (tell user to click button instead)
@@ -1,19 +1,24 @@
+import atexit
 import json
 import logging
 import os
 import stat
 import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, List
+from functools import lru_cache
+from typing import Any, Dict, Optional, List, Tuple
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
 def _parse_iso_to_utc(value: str) -> datetime:
     """
     Parse ISO8601 string to timezone-aware UTC datetime.
     If the string has no tzinfo, we assume it was stored as UTC.
+    Cached: rate-limit windows re-parse the same attempt timestamps on every check.
     """
     dt = datetime.fromisoformat(value)
     if dt.tzinfo is None:
@@ -32,6 +37,21 @@ START_USERS_CLICKS_FILE = os.path.join(BASE_DIR, "startusersclicks.json")
 
 _lock = threading.Lock()
 
+# Short-lived in-process cache for read-mostly files: path -> (expires_at, data).
+# Entries are dropped whenever this process writes the file; the TTL bounds
+# staleness for writes made by another process (bot vs. web app).
+_CACHE_TTL_SECONDS = 15.0
+_read_cache: Dict[str, Tuple[float, Any]] = {}
+
+# Write-back state for ACTIVE_TRIALS_FILE. Updates land in memory and are
+# coalesced into a single file write shortly after; reads see the pending data.
+# This trades durability for fewer writes: a SIGKILL or crash inside the delay
+# window loses the buffered updates. atexit does not run on every signal-driven
+# shutdown, so the bot also calls flush_pending_writes() from its shutdown hook.
+_WRITE_BACK_DELAY_SECONDS = 0.2
+_active_trials_dirty: Optional[Dict[str, Any]] = None
+_flush_timer: Optional[threading.Timer] = None
+
 
 def _load_json(path: str, default: Any) -> Any:
     if not os.path.exists(path):
@@ -44,7 +64,22 @@ def _load_json(path: str, default: Any) -> Any:
         return default
 
 
+def _load_json_cached(path: str, default: Any) -> Any:
+    """
+    Like _load_json, but served from the in-process cache while fresh.
+    Callers must hold _lock and must not mutate the returned data.
+    """
+    now = time.monotonic()
+    entry = _read_cache.get(path)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    data = _load_json(path, default)
+    _read_cache[path] = (now + _CACHE_TTL_SECONDS, data)
+    return data
+
+
 def _save_json(path: str, data: Any) -> None:
+    _read_cache.pop(path, None)
     tmp_path = f"{path}.tmp"
     try:
         with open(tmp_path, "w", encoding="utf-8") as f:
@@ -78,6 +113,52 @@ def _save_json(path: str, data: Any) -> None:
         raise  # Re-raise to let caller know save failed
 
 
+def _active_trials_snapshot() -> Dict[str, Any]:
+    """
+    Current active trials, preferring unflushed in-memory updates.
+    Callers must hold _lock and must not mutate the returned data.
+    """
+    if _active_trials_dirty is not None:
+        return _active_trials_dirty
+    return _load_json_cached(ACTIVE_TRIALS_FILE, {})
+
+
+def _schedule_active_trials_flush(data: Dict[str, Any]) -> None:
+    """
+    Record new active trials data and schedule a coalesced write.
+    Callers must hold _lock.
+    """
+    global _active_trials_dirty, _flush_timer
+    _active_trials_dirty = data
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(_WRITE_BACK_DELAY_SECONDS, flush_pending_writes)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush_pending_writes() -> None:
+    """
+    Write any buffered active trials data to disk.
+    Runs from the write-back timer and at interpreter exit. Processes that
+    update active trials must also call it from their own shutdown path:
+    updates still inside the write-back window are otherwise lost.
+    """
+    global _active_trials_dirty, _flush_timer
+    with _lock:
+        _flush_timer = None
+        if _active_trials_dirty is None:
+            return
+        try:
+            _save_json(ACTIVE_TRIALS_FILE, _active_trials_dirty)
+            _active_trials_dirty = None
+        except Exception as e:
+            # Keep the data buffered; the next update or shutdown flush retries
+            logger.error(f"flush_pending_writes: Failed to write active trials: {e}")
+
+
+atexit.register(flush_pending_writes)
+
+
 def get_pending_verification(tg_id: int) -> Optional[Dict[str, Any]]:
     with _lock:
         logger.debug(f"get_pending_verification: Looking for tg_id={tg_id}")
@@ -92,6 +173,31 @@ def get_pending_verification(tg_id: int) -> Optional[Dict[str, Any]]:
         return result
 
 
+# Pending-verification statuses that mean the phone step is over
+_PHONE_STAGE_DONE_STATUSES = frozenset(("verified", "blocked_phone_india"))
+
+
+def get_phone_stage_user_ids() -> List[int]:
+    """
+    Return tg_ids whose pending verification passed step 1 but whose phone
+    is not yet verified or blocked (used to rebuild the bot's in-memory set on startup).
+    """
+    with _lock:
+        data = _load_json(PENDING_FILE, {})
+    user_ids = []
+    for key, info in data.items():
+        if (
+            isinstance(info, dict)
+            and info.get("step1_ok")
+            and info.get("status") not in _PHONE_STAGE_DONE_STATUSES
+        ):
+            try:
+                user_ids.append(int(key))
+            except ValueError:
+                continue
+    return user_ids
+
+
 def set_pending_verification(tg_id: int, info: Dict[str, Any]) -> None:
     with _lock:
         data = _load_json(PENDING_FILE, {})
@@ -122,13 +228,25 @@ def append_trial_log(record: Dict[str, Any]) -> None:
         _save_json(TRIAL_LOG_FILE, records)
 
 
+def bulk_append_trial_log(records: List[Dict[str, Any]]) -> None:
+    """
+    Append several trial log records with a single read/rewrite of the log file.
+    """
+    if not records:
+        return
+    with _lock:
+        existing: List[Dict[str, Any]] = _load_json(TRIAL_LOG_FILE, [])
+        existing.extend(records)
+        _save_json(TRIAL_LOG_FILE, existing)
+
+
 def has_used_trial(tg_id: int) -> bool:
     """
     Check if a user has already consumed their free trial.
     Data is stored in USED_TRIALS_FILE as a mapping of tg_id -> record.
     """
     with _lock:
-        data = _load_json(USED_TRIALS_FILE, {})
+        data = _load_json_cached(USED_TRIALS_FILE, {})
         result = str(tg_id) in data
         logger.debug(f"has_used_trial({tg_id}): {result}, file has {len(data)} entries")
         return result
@@ -153,13 +271,37 @@ def mark_trial_used(tg_id: int, info: Dict[str, Any]) -> None:
             logger.error(f"mark_trial_used: FAILED to save trial for user {tg_id} - data not found after save!")
 
 
+def finalize_trial(tg_id: int, info: Dict[str, Any]) -> bool:
+    """
+    End a user's trial: mark it used and clear the active trial in one
+    critical section. An existing used-trial record is kept as-is.
+    Returns True if the user was newly marked as used.
+    """
+    key = str(tg_id)
+    with _lock:
+        data = _load_json(USED_TRIALS_FILE, {})
+        newly_marked = key not in data
+        if newly_marked:
+            data[key] = info
+            _save_json(USED_TRIALS_FILE, data)
+            logger.info(f"finalize_trial: Marked user {tg_id} as used, info={info}")
+        
+        active = _active_trials_snapshot()
+        if key in active:
+            active = dict(active)
+            active.pop(key, None)
+            _schedule_active_trials_flush(active)
+            logger.info(f"finalize_trial: Cleared active trial for user {tg_id}")
+    return newly_marked
+
+
 def get_used_trial_info(tg_id: int) -> Optional[Dict[str, Any]]:
     """
     Get information about a user's used trial, if any.
     Returns the trial info dict if user has used a trial, None otherwise.
     """
     with _lock:
-        data = _load_json(USED_TRIALS_FILE, {})
+        data = _load_json_cached(USED_TRIALS_FILE, {})
         return data.get(str(tg_id))
 
 
@@ -168,8 +310,26 @@ def get_all_active_trials() -> Dict[str, Any]:
     Return all active trial records as a mapping of tg_id -> info.
     """
     with _lock:
-        data = _load_json(ACTIVE_TRIALS_FILE, {})
-        return data
+        return dict(_active_trials_snapshot())
+
+
+def get_all_active_trials_typed() -> Dict[int, Any]:
+    """
+    Return all active trial records keyed by integer tg_id.
+    Keys that are not valid user ids are skipped (and logged once).
+    """
+    with _lock:
+        data = _active_trials_snapshot()
+    result: Dict[int, Any] = {}
+    bad_keys = []
+    for key, info in data.items():
+        try:
+            result[int(key)] = info
+        except ValueError:
+            bad_keys.append(key)
+    if bad_keys:
+        logger.warning(f"get_all_active_trials_typed: Skipping non-numeric keys {bad_keys}")
+    return result
 
 
 def get_active_trial(tg_id: int) -> Optional[Dict[str, Any]]:
@@ -178,8 +338,7 @@ def get_active_trial(tg_id: int) -> Optional[Dict[str, Any]]:
     Stored as a mapping of tg_id -> {join_time, total_hours, ...}.
     """
     with _lock:
-        data = _load_json(ACTIVE_TRIALS_FILE, {})
-        return data.get(str(tg_id))
+        return _active_trials_snapshot().get(str(tg_id))
 
 
 def set_active_trial(tg_id: int, info: Dict[str, Any]) -> None:
@@ -188,9 +347,9 @@ def set_active_trial(tg_id: int, info: Dict[str, Any]) -> None:
     Called when the user joins the trial channel.
     """
     with _lock:
-        data = _load_json(ACTIVE_TRIALS_FILE, {})
+        data = dict(_active_trials_snapshot())
         data[str(tg_id)] = info
-        _save_json(ACTIVE_TRIALS_FILE, data)
+        _schedule_active_trials_flush(data)
         logger.info(f"set_active_trial: Set active trial for user {tg_id}, total_hours={info.get('total_hours')}")
 
 
@@ -200,15 +359,28 @@ def clear_active_trial(tg_id: int) -> None:
     Called when the trial ends or the user leaves.
     """
     with _lock:
-        data = _load_json(ACTIVE_TRIALS_FILE, {})
+        data = _active_trials_snapshot()
         if str(tg_id) in data:
+            data = dict(data)
             data.pop(str(tg_id), None)
-            _save_json(ACTIVE_TRIALS_FILE, data)
+            _schedule_active_trials_flush(data)
             logger.info(f"clear_active_trial: Cleared active trial for user {tg_id}")
         else:
             logger.debug(f"clear_active_trial: No active trial found for user {tg_id} to clear")
 
 
+def get_user_state(tg_id: int) -> Dict[str, Any]:
+    """
+    Return the trial state the entry handlers check first, under one lock:
+    {"used": bool, "active": dict | None}.
+    """
+    key = str(tg_id)
+    with _lock:
+        used = key in _load_json_cached(USED_TRIALS_FILE, {})
+        active = _active_trials_snapshot().get(key)
+    return {"used": used, "active": active}
+
+
 def get_invite_info(tg_id: int) -> Optional[Dict[str, Any]]:
     """
     Get stored invite info for a user, if any.
@@ -237,7 +409,20 @@ def get_valid_invite_link(tg_id: int, now: datetime) -> Optional[str]:
     with _lock:
         data = _load_json(INVITES_FILE, {})
         invite_info = data.get(str(tg_id))
-        if not invite_info or "invite_expires_at" not in invite_info:
+        if not invite_info:
+            return None
+        
+        # Newer records carry the expiry as epoch seconds; no parsing needed
+        expires_ts = invite_info.get("invite_expires_ts")
+        if expires_ts is not None:
+            try:
+                if now.timestamp() < float(expires_ts) and invite_info.get("invite_link"):
+                    return invite_info["invite_link"]
+            except (TypeError, ValueError):
+                return None
+            return None
+        
+        if "invite_expires_at" not in invite_info:
             return None
         
         try:
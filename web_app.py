@@ -846,6 +846,30 @@ TRIAL_PAGE = """
 """
 
 
+def _record_step1_final_failure(tg_id: int, reason: str) -> None:
+    """
+    Mark step 1 as definitively failed for a user (e.g. blocked region).
+    Existing pending data (such as rate-limit attempts) is preserved.
+    A record that already passed step 1 (including later phone-stage
+    statuses such as blocked_phone_india) is never downgraded.
+    """
+    try:
+        data = get_pending_verification(tg_id) or {}
+        if data.get("step1_ok"):
+            logger.info(f"Not recording step1 failure for tg_id={tg_id}: step 1 already passed")
+            return
+        data.update({
+            "step1_ok": False,
+            "step1_final": True,
+            "status": "step1_failed",
+            "reason": reason,
+            "created_at": _now_utc().isoformat(),
+        })
+        set_pending_verification(tg_id, data)
+    except Exception as e:
+        logger.warning(f"Could not record step1 failure for tg_id={tg_id}: {e}")
+
+
 def _render(message: str, show_form: bool, already_passed: bool = False) -> str:
     return render_template_string(TRIAL_PAGE, message=message, show_form=show_form, already_passed=already_passed)
 
@@ -985,7 +1009,6 @@ def trial() -> str:
             active_trial = get_active_trial(tg_id)
             if active_trial and "join_time" in active_trial and "total_hours" in active_trial:
                 try:
-                    from datetime import datetime, timezone, timedelta
                     join_time_str = active_trial["join_time"]
                     join_time = datetime.fromisoformat(join_time_str)
                     if join_time.tzinfo is None:
@@ -1134,6 +1157,8 @@ def trial() -> str:
         )
 
     if is_blocked:
+        # Region blocks are final: record it so the bot doesn't keep re-querying our API
+        _record_step1_final_failure(tg_id, "blocked_country")
         country_name = "Pakistan" if BLOCKED_COUNTRY_CODE == "PK" else "India" if BLOCKED_COUNTRY_CODE == "IN" else BLOCKED_COUNTRY_CODE
         return _render(
             f"Sorry, you are not eligible for this trial from your region ({country_name}). "